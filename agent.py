@@ -1,16 +1,225 @@
 import os
 import re
 import json
+import threading
+import time
 from datetime import datetime
-from anthropic import Anthropic
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Iterator, Optional
 
-load_dotenv()
+from scheduler import RequestScheduler, estimate_request_tokens
+from tracing import span
+
+if TYPE_CHECKING:
+    import concurrent.futures
+
+
+class MarkdownStreamCleaner:
+    """Apply a line-local markdown cleaner to text arriving in chunks.
+
+    The cleaning patterns never span a newline and always start at a '*' or
+    '_', so everything before the first marker on the current line can be
+    emitted immediately; the rest is held until the line completes, or until
+    MAX_HOLD characters are held (a lone '_' as in task_3 never closes, and
+    would otherwise hold back the rest of a long line). Emphasis longer than
+    that shows its markers.
+    """
+
+    MARKERS = ('*', '_')
+    MAX_HOLD = 60
+
+    def __init__(self, clean):
+        self.clean = clean
+        self.pending = ""
+
+    def feed(self, delta: str) -> str:
+        """Add a chunk; return the text that is now safe to display."""
+        self.pending += delta
+        out = ""
+
+        head, newline, tail = self.pending.rpartition("\n")
+        if newline:
+            out = self.clean(head + newline)
+            self.pending = tail
+
+        cut = min((i for i in (self.pending.find(m) for m in self.MARKERS) if i != -1),
+                  default=len(self.pending))
+        out += self.pending[:cut]
+        self.pending = self.pending[cut:]
+        if len(self.pending) > self.MAX_HOLD:
+            out += self.flush()
+        return out
+
+    def flush(self) -> str:
+        """Return whatever is still held back, cleaned."""
+        out = self.clean(self.pending)
+        self.pending = ""
+        return out
+
+
+def _usage_attrs(attrs: dict, usage):
+    """Copy a response's token counts onto a tracing span."""
+    attrs["input_tokens"] = usage.input_tokens
+    attrs["output_tokens"] = usage.output_tokens
+    attrs["cache_read_input_tokens"] = getattr(usage, "cache_read_input_tokens", None)
+
+
+def _first_byte(attrs: dict, started: float):
+    """Note time to first streamed content on a tracing span, once."""
+    if "ttfb_ms" not in attrs:
+        attrs["ttfb_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+
+class JSONArrayStreamParser:
+    """Pick the elements out of a JSON document's first array as it streams in.
+
+    Built for tool inputs like {"tasks": [{...}, {...}]}: feed() each
+    partial-JSON chunk and get back the elements completed by it. Object
+    and array elements are returned as soon as they close; scalars once
+    the following ',' or ']' arrives. Malformed elements are skipped.
+    """
 
-class Agent:
     def __init__(self):
-        self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.depth = 0
+        self.array_depth = None  # depth just inside the array, once found
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self.element = []
+
+    def feed(self, chunk: str) -> list:
+        """Add a chunk; return the array elements it completed."""
+        items = []
+        for ch in chunk:
+            if self.done:
+                break
+            inside = self.array_depth is not None
+            if inside:
+                self.element.append(ch)
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                if not inside and ch == "[":
+                    self.array_depth = self.depth
+            elif ch in "}]":
+                self.depth -= 1
+                if inside and self.depth == self.array_depth:
+                    self._take(items)
+                elif inside and self.depth < self.array_depth:
+                    self.element.pop()
+                    self._take(items)
+                    self.done = True
+            elif ch == "," and inside and self.depth == self.array_depth:
+                self.element.pop()
+                self._take(items)
+        return items
+
+    def _take(self, items: list):
+        text = "".join(self.element).strip()
+        self.element = []
+        if text:
+            try:
+                items.append(json.loads(text))
+            except json.JSONDecodeError:
+                pass
+
+
+# Forced tool calls for the methods that need structured output. The model
+# fills in input_schema instead of writing JSON into prose.
+TASKS_TOOL = {
+    "name": "save_tasks",
+    "description": "Save the generated tasks for the user's goal.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "tasks": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "description": {"type": "string", "description": "Specific action"},
+                        "estimated_hours": {"type": "number", "description": "Realistic estimate"},
+                        "due_date": {"type": ["string", "null"], "description": "YYYY-MM-DD or null"},
+                    },
+                    "required": ["description", "estimated_hours", "due_date"],
+                },
+            },
+        },
+        "required": ["tasks"],
+    },
+}
+
+PROFILE_TOOL = {
+    "name": "update_profile",
+    "description": "Record facts about the user. Include only fields explicitly mentioned.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "current_role": {"type": "string"},
+            "experience_years": {"type": "number"},
+            "current_company": {"type": "string"},
+            "strengths": {"type": "array", "items": {"type": "string"}},
+            "weaknesses": {"type": "array", "items": {"type": "string"}},
+            "target_companies": {"type": "array", "items": {"type": "string"}},
+            "target_roles": {"type": "array", "items": {"type": "string"}},
+            "availability_hours_per_day": {"type": "number"},
+        },
+    },
+}
+
+
+class Agent:
+    # How long each one-shot method's responses may be served from the
+    # response cache, in seconds. Methods not listed (conversation turns,
+    # summaries, profile extraction) always go to the API.
+    CACHE_TTLS = {
+        'daily_checkin_greeting': 6 * 3600,
+        'goal_discovery_greeting': 24 * 3600,
+        'break_down_goal': 7 * 24 * 3600,
+        'generate_tasks_from_context': 24 * 3600,
+    }
+
+    def __init__(self, response_cache=None, base_url: str = None,
+                 scheduler: RequestScheduler = None):
+        """response_cache: optional llm_cache.ResponseCache for one-shot calls.
+        base_url: API endpoint override, e.g. a local mock_server for benchmarks.
+        scheduler: rate limits, retries and deadlines for every API call.
+        """
+        self._client = None
+        self.base_url = base_url or os.getenv("ANTHROPIC_BASE_URL")
         self.model = "claude-sonnet-4-20250514"
+        self.usage_log = []  # one entry per conversation turn
+        self.response_cache = response_cache
+        self.scheduler = scheduler or RequestScheduler()
+
+    @property
+    def client(self):
+        """The Anthropic client, built on first use.
+
+        anthropic and dotenv are imported here rather than at module level
+        so commands that never call the API don't pay for them.
+        """
+        if self._client is None:
+            from anthropic import Anthropic
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            # Retries are the scheduler's job
+            self._client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"),
+                                     base_url=self.base_url, max_retries=0)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     def _clean_markdown(self, text: str) -> str:
         """Remove markdown formatting for CLI display"""
@@ -23,6 +232,114 @@ class Agent:
     def _today(self) -> str:
         return datetime.now().strftime("%Y-%m-%d")
 
+    def _cache_ttl(self, method: str) -> Optional[float]:
+        if self.response_cache is None:
+            return None
+        return self.CACHE_TTLS.get(method)
+
+    def _create_text(self, method: str, request: dict) -> str:
+        """messages.create(**request) and return the reply text, via the cache."""
+        ttl = self._cache_ttl(method)
+        if ttl:
+            cached = self.response_cache.get(request)
+            if cached is not None:
+                return cached
+
+        message = self._create(request)
+        text = self._reply_text(message)
+        if ttl:
+            self.response_cache.put(request, text, ttl)
+        return text
+
+    def _reply_text(self, message) -> str:
+        """Reply text, or the JSON input of a forced tool call."""
+        block = message.content[0]
+        if block.type == "tool_use":
+            return json.dumps(block.input)
+        return block.text
+
+    def _create_tool_input(self, method: str, request: dict, on_item) -> str:
+        """Stream a forced tool call and return its input as JSON text, via the cache.
+
+        on_item(element) is called for each element of the input's first
+        array as soon as it has streamed in.
+        """
+        parser = JSONArrayStreamParser()
+        ttl = self._cache_ttl(method)
+        if ttl:
+            cached = self.response_cache.get(request)
+            if cached is not None:
+                for item in parser.feed(cached):
+                    on_item(item)
+                return cached
+
+        tokens = estimate_request_tokens(request)
+        started = time.perf_counter()
+        with span("llm.stream", model=request["model"]) as attrs, self.scheduler.call(
+            lambda timeout: self.client.messages.stream(**request, timeout=timeout).__enter__(),
+            tokens
+        ) as stream:
+            for event in stream:
+                if event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+                    _first_byte(attrs, started)
+                    for item in parser.feed(event.delta.partial_json):
+                        on_item(item)
+            message = stream.get_final_message()
+            _usage_attrs(attrs, message.usage)
+        self.scheduler.settle(tokens, message.usage.input_tokens + message.usage.output_tokens)
+
+        text = self._reply_text(message)
+        # A reply cut off by max_tokens is incomplete; don't keep it
+        if ttl and message.stop_reason != "max_tokens":
+            self.response_cache.put(request, text, ttl)
+        return text
+
+    def _create(self, request: dict):
+        """messages.create(**request) through the request scheduler."""
+        tokens = estimate_request_tokens(request)
+        with span("llm.create", model=request["model"]) as attrs:
+            message = self.scheduler.call(
+                lambda timeout: self.client.messages.create(**request, timeout=timeout),
+                tokens
+            )
+            _usage_attrs(attrs, message.usage)
+        self.scheduler.settle(tokens, message.usage.input_tokens + message.usage.output_tokens)
+        return message
+
+    def _cached_system(self, system_prompt) -> list:
+        """Wrap a system prompt as a single cacheable block.
+
+        Prompts under the model's minimum cacheable length are simply sent
+        uncached, so this is safe to use for short prompts too. A list is
+        taken to be ready-made blocks and passed through.
+        """
+        if isinstance(system_prompt, list):
+            return system_prompt
+        return [{
+            "type": "text",
+            "text": system_prompt,
+            "cache_control": {"type": "ephemeral"},
+        }]
+
+    def _record_usage(self, usage) -> dict:
+        """Store token usage (including prompt-cache reads/writes) for a turn."""
+        entry = {
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+        }
+        self.usage_log.append(entry)
+        return entry
+
+    def usage_totals(self) -> dict:
+        """Sum token usage over every recorded turn."""
+        totals = {"turns": len(self.usage_log)}
+        for entry in self.usage_log:
+            for key, value in entry.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
     # ------------------------------------------------------------------
     # Interactive mode
     # ------------------------------------------------------------------
@@ -33,10 +350,26 @@ class Agent:
         """Build a rich system prompt for interactive conversation mode.
 
         Gives the agent full context so it can have an informed conversation.
+        Sections are ordered most-stable first so the prompt-cache prefix
+        survives task changes; see InteractivePromptBuilder.
         """
-        name = user_profile.get('general', {}).get('name', '')
+        return "".join([
+            self.interactive_section('profile', user_profile),
+            self.interactive_section('goals', goals),
+            self.interactive_section('overdue', overdue_tasks),
+            self.interactive_section('today', today_tasks),
+            self.interactive_section('active', active_tasks),
+        ])
+
+    def interactive_section(self, section: str, data) -> str:
+        """Render one section of the interactive system prompt.
 
-        prompt = f"""You are Compass, a personal AI accountability agent. Today is {self._today()}.
+        'profile' covers the persona, behaviors and profile facts (all of
+        which only change with the profile); the rest are one list each.
+        """
+        if section == 'profile':
+            name = data.get('general', {}).get('name', '')
+            prompt = f"""You are Compass, a personal AI accountability agent. Today is {self._today()}.
 {f'You are talking to {name}.' if name else ''}
 
 Your personality: direct, firm, conversational. You don't waste words. You ask pointed questions.
@@ -45,63 +378,61 @@ When the user is stuck, help them think through it. When they're avoiding someth
 Keep responses to 2-4 sentences unless more detail is needed.
 
 Do NOT use markdown formatting (no bold, italics, bullet points). Write in plain conversational text.
-"""
 
-        # Goals and tasks context
-        if goals:
-            prompt += "\nACTIVE GOALS:\n"
-            for g in goals:
+IMPORTANT BEHAVIORS:
+- When the user says they finished something, acknowledge it and ask what's next.
+- When the user wants to add a new goal, tell them to use: /new (it starts a guided flow).
+- When the user asks about their tasks or goals, reference the actual data in this prompt.
+- When the user seems stuck or avoidant, ask what's specifically blocking them.
+- If the user asks you to mark something done, tell them to use /done <task_id>.
+- Keep the conversation moving forward. Always end with a question or next step.
+"""
+            if data:
+                prompt += "\nUSER PROFILE:\n"
+                for category, values in data.items():
+                    if values and any(v for v in values.values()):
+                        for key, value in values.items():
+                            if value:
+                                prompt += f"- {key}: {value}\n"
+            return prompt
+
+        if not data:
+            return ""
+
+        if section == 'goals':
+            prompt = "\nACTIVE GOALS:\n"
+            for g in data:
                 prompt += f"- \"{g['name']}\" (ID {g['id']})"
                 if g.get('deadline'):
                     prompt += f" — deadline {g['deadline']}"
                 prompt += "\n"
+            return prompt
 
-        if overdue_tasks:
-            prompt += f"\nOVERDUE TASKS ({len(overdue_tasks)}):\n"
-            for t in overdue_tasks:
+        if section == 'overdue':
+            prompt = f"\nOVERDUE TASKS ({len(data)}):\n"
+            for t in data:
                 prompt += f"- ID {t['id']}: \"{t['description']}\" (due {t['due_date']})\n"
+            return prompt
 
-        if today_tasks:
-            prompt += f"\nDUE TODAY ({len(today_tasks)}):\n"
-            for t in today_tasks:
+        if section == 'today':
+            prompt = f"\nDUE TODAY ({len(data)}):\n"
+            for t in data:
                 prompt += f"- ID {t['id']}: \"{t['description']}\"\n"
+            return prompt
 
-        if active_tasks:
-            prompt += f"\nALL ACTIVE TASKS ({len(active_tasks)}):\n"
-            for t in active_tasks:
-                status = "overdue" if t.get('due_date') and t['due_date'] < self._today() else "pending"
+        if section == 'active':
+            today = self._today()
+            prompt = f"\nALL ACTIVE TASKS ({len(data)}):\n"
+            for t in data:
+                status = "overdue" if t.get('due_date') and t['due_date'] < today else "pending"
                 prompt += f"- ID {t['id']}: \"{t['description']}\" ({status})\n"
+            return prompt
 
-        # Profile context
-        if user_profile:
-            prompt += "\nUSER PROFILE:\n"
-            for category, data in user_profile.items():
-                if data and any(v for v in data.values()):
-                    for key, value in data.items():
-                        if value:
-                            prompt += f"- {key}: {value}\n"
+        raise ValueError(f"Unknown prompt section: {section}")
 
-        prompt += """
-IMPORTANT BEHAVIORS:
-- When the user says they finished something, acknowledge it and ask what's next.
-- When the user wants to add a new goal, tell them to use: /new (it starts a guided flow).
-- When the user asks about their tasks or goals, reference the actual data above.
-- When the user seems stuck or avoidant, ask what's specifically blocking them.
-- If the user asks you to mark something done, tell them to use /done <task_id>.
-- Keep the conversation moving forward. Always end with a question or next step.
-"""
-        return prompt
-
-    def conversation_turn(self, message_history: list, user_message: str,
-                          system_prompt: str = None, context: dict = None) -> str:
-        """Handle one turn of a multi-turn conversation.
-
-        Args:
-            message_history: List of {"role": "user"|"assistant", "content": "..."}
-            user_message: Latest message from user
-            system_prompt: Optional system prompt (used by interactive mode)
-            context: Optional context dict (used by checkin mode, builds its own system prompt)
-        """
+    def _conversation_system_prompt(self, system_prompt: str = None,
+                                    context: dict = None) -> str:
+        """Pick the system prompt for a conversation turn."""
 
         if not system_prompt and context:
             system_prompt = """You are a direct, firm accountability agent. Your job is to keep the user on track with their goals.
@@ -123,27 +454,120 @@ Keep responses to 2-3 sentences. Be helpful but direct."""
         elif not system_prompt:
             system_prompt = "You are a direct, helpful personal productivity agent. Keep responses concise."
 
+        return system_prompt
+
+    def conversation_turn(self, message_history: list, user_message: str,
+                          system_prompt: str = None, context: dict = None) -> str:
+        """Handle one turn of a multi-turn conversation.
+
+        Args:
+            message_history: List of {"role": "user"|"assistant", "content": "..."}
+            user_message: Latest message from user
+            system_prompt: Optional system prompt (used by interactive mode)
+            context: Optional context dict (used by checkin mode, builds its own system prompt)
+        """
+
+        system_prompt = self._conversation_system_prompt(system_prompt, context)
         message_history.append({"role": "user", "content": user_message})
 
-        message = self.client.messages.create(
+        message = self._create(dict(
             model=self.model,
             max_tokens=1000,
-            system=system_prompt,
+            system=self._cached_system(system_prompt),
             messages=message_history
-        )
+        ))
+        self._record_usage(message.usage)
 
         response = message.content[0].text
         return self._clean_markdown(response)
 
+    def stream_conversation_turn(self, message_history: list, user_message: str,
+                                 system_prompt: str = None, context: dict = None) -> Iterator[str]:
+        """Streaming version of conversation_turn.
+
+        Yields markdown-cleaned text as it arrives. Joined together, the
+        chunks equal what conversation_turn would have returned.
+        """
+
+        system_prompt = self._conversation_system_prompt(system_prompt, context)
+        message_history.append({"role": "user", "content": user_message})
+
+        request = dict(
+            model=self.model,
+            max_tokens=1000,
+            system=self._cached_system(system_prompt),
+            messages=message_history
+        )
+        tokens = estimate_request_tokens(request)
+        # Only opening the stream is scheduled (and retried); once text is
+        # flowing, a failure surfaces to the caller.
+        cleaner = MarkdownStreamCleaner(self._clean_markdown)
+        started = time.perf_counter()
+        with span("llm.stream", model=self.model) as attrs, self.scheduler.call(
+            lambda timeout: self.client.messages.stream(**request, timeout=timeout).__enter__(),
+            tokens
+        ) as stream:
+            for delta in stream.text_stream:
+                _first_byte(attrs, started)
+                text = cleaner.feed(delta)
+                if text:
+                    yield text
+            usage = stream.get_final_message().usage
+            _usage_attrs(attrs, usage)
+            self._record_usage(usage)
+            self.scheduler.settle(tokens, usage.input_tokens + usage.output_tokens)
+        text = cleaner.flush()
+        if text:
+            yield text
+
+    def summarize_conversation(self, summary: str, messages: list) -> str:
+        """Fold older conversation messages into a running summary."""
+
+        conversation_text = "\n".join([
+            f"{msg['role']}: {msg['content']}"
+            for msg in messages
+        ])
+
+        prompt = f"""You are maintaining a running summary of a conversation between a user and
+their accountability agent, so older turns can be dropped from context.
+
+Summary so far:
+{summary or '(none)'}
+
+New turns to fold in:
+{conversation_text}
+
+Write the updated summary in under 200 words. Keep commitments, deadlines,
+blockers, task IDs and facts about the user. Drop small talk.
+Do NOT use markdown formatting."""
+
+        message = self._create(dict(
+            model=self.model,
+            max_tokens=500,
+            messages=[{"role": "user", "content": prompt}]
+        ))
+
+        return self._clean_markdown(message.content[0].text)
+
     # ------------------------------------------------------------------
     # Daily check-in
     # ------------------------------------------------------------------
 
     def daily_checkin_greeting(self, context: dict) -> str:
         """Generate opening greeting for daily check-in."""
+        text = self._create_text('daily_checkin_greeting',
+                                 self.checkin_greeting_request(context))
+        return self._clean_markdown(text)
+
+    def checkin_greeting_request(self, context: dict, date: str = None) -> dict:
+        """messages.create request for a check-in greeting (also used in batches).
+
+        date is the day the check-in happens (default today); batch-checkin
+        prepares greetings the night before.
+        """
 
         prompt = f"""You are starting a daily check-in conversation. Be direct and firm.
-Today's date is {self._today()}.
+Today's date is {date or self._today()}.
 
 Context:
 - Active goals: {[g['name'] for g in context.get('goals', [])]}
@@ -156,13 +580,59 @@ Reference specific context (overdue tasks, yesterday's work, etc.).
 Ask what they're working on today.
 Do NOT use markdown formatting."""
 
-        message = self.client.messages.create(
+        return dict(
             model=self.model,
             max_tokens=1000,
             messages=[{"role": "user", "content": prompt}]
         )
 
-        return self._clean_markdown(message.content[0].text)
+    # ------------------------------------------------------------------
+    # Message Batches (half price, results within 24 hours)
+    # ------------------------------------------------------------------
+
+    def submit_batch(self, requests: dict) -> str:
+        """Submit {custom_id: request} as one Message Batch. Returns the batch ID."""
+        batch = self.scheduler.call(
+            lambda timeout: self.client.messages.batches.create(
+                requests=[{"custom_id": custom_id, "params": request}
+                          for custom_id, request in requests.items()],
+                timeout=timeout
+            ),
+            0
+        )
+        return batch.id
+
+    def wait_for_batch(self, batch_id: str, poll_interval: float = 60.0,
+                       timeout: float = None, on_poll=None):
+        """Poll until the batch has ended and return it.
+
+        on_poll(batch) is called after every poll that finds it still
+        running. Raises TimeoutError once timeout seconds have passed.
+        """
+        started = time.monotonic()
+        while True:
+            batch = self.scheduler.call(
+                lambda t: self.client.messages.batches.retrieve(batch_id, timeout=t), 0
+            )
+            if batch.processing_status == "ended":
+                return batch
+            if on_poll:
+                on_poll(batch)
+            if timeout is not None and time.monotonic() - started + poll_interval > timeout:
+                raise TimeoutError(f"batch {batch_id} still {batch.processing_status}")
+            time.sleep(poll_interval)
+
+    def batch_results(self, batch_id: str) -> dict:
+        """{custom_id: text} for the requests of an ended batch that succeeded"""
+        results = {}
+        entries = self.scheduler.call(
+            lambda t: self.client.messages.batches.results(batch_id, timeout=t), 0
+        )
+        for entry in entries:
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = self._clean_markdown(
+                    entry.result.message.content[0].text)
+        return results
 
     # ------------------------------------------------------------------
     # Goal discovery and task generation
@@ -188,13 +658,13 @@ Be direct and specific. Ask about current state, target outcome, constraints.
 Keep it to 2-3 sentences. Don't ask for information you already have.
 Do NOT use markdown formatting."""
 
-        message = self.client.messages.create(
+        text = self._create_text('goal_discovery_greeting', dict(
             model=self.model,
             max_tokens=500,
             messages=[{"role": "user", "content": prompt}]
-        )
+        ))
 
-        return self._clean_markdown(message.content[0].text)
+        return self._clean_markdown(text)
 
     def break_down_goal(self, goal_name: str, goal_description: str,
                         deadline: str = None) -> str:
@@ -210,22 +680,36 @@ Deadline: {deadline or 'Not specified'}
 For each task: description, estimated hours, suggested due date.
 Return as a simple numbered list. 5-10 tasks max. Be practical."""
 
-        message = self.client.messages.create(
+        text = self._create_text('break_down_goal', dict(
             model=self.model,
             max_tokens=2000,
             messages=[{"role": "user", "content": prompt}]
-        )
+        ))
 
-        return self._clean_markdown(message.content[0].text)
+        return self._clean_markdown(text)
 
     def generate_tasks_from_context(self, goal_name: str, goal_description: str,
                                      goal_context: str, user_profile: dict,
-                                     deadline: str = None) -> list:
+                                     deadline: str = None, on_task=None) -> list:
         """Generate personalized tasks based on goal context and user profile.
 
         Returns list of task dicts with description, estimated_hours, due_date.
+        on_task(task) is called with each task as soon as it has streamed in.
         """
 
+        text = self._create_tool_input(
+            'generate_tasks_from_context',
+            self._generate_tasks_request(goal_name, goal_description, goal_context,
+                                         user_profile, deadline),
+            on_item=self._task_callback(on_task)
+        )
+        return self._parse_tasks(text)
+
+    def _generate_tasks_request(self, goal_name: str, goal_description: str,
+                                goal_context: str, user_profile: dict,
+                                deadline: str = None) -> dict:
+        """messages.create arguments for generate_tasks_from_context."""
+
         prompt = f"""Generate specific, actionable tasks for this goal.
 
 IMPORTANT: Today's date is {self._today()}. All due dates must be today or later.
@@ -240,34 +724,48 @@ User Profile:
 Goal-Specific Context (from conversation):
 {goal_context}
 
-Return ONLY a JSON array. Each task:
-- "description": specific action
-- "estimated_hours": realistic estimate
-- "due_date": YYYY-MM-DD or null
-
-Example:
-[
-  {{"description": "Task 1", "estimated_hours": 2.5, "due_date": "2026-02-15"}},
-  {{"description": "Task 2", "estimated_hours": 3, "due_date": null}}
-]
+Save 5-10 tasks with the save_tasks tool. Realistic and specific to their situation."""
 
-5-10 tasks. Realistic and specific to their situation."""
-
-        message = self.client.messages.create(
+        return dict(
             model=self.model,
             max_tokens=2000,
+            tools=[TASKS_TOOL],
+            tool_choice={"type": "tool", "name": TASKS_TOOL["name"]},
             messages=[{"role": "user", "content": prompt}]
         )
 
-        response = message.content[0].text
-
-        json_match = re.search(r'\[.*\]', response, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError:
-                return []
-        return []
+    def _parse_tasks(self, response: str) -> list:
+        """Valid tasks from save_tasks input JSON."""
+        try:
+            tasks = json.loads(response).get("tasks", [])
+        except (json.JSONDecodeError, AttributeError):
+            return []
+        if not isinstance(tasks, list):
+            return []
+        return [task for task in map(self._validate_task, tasks) if task]
+
+    def _validate_task(self, task) -> Optional[dict]:
+        """Normalize one task from the model, or None if it has no description."""
+        if not isinstance(task, dict):
+            return None
+        description = task.get('description')
+        if not isinstance(description, str) or not description.strip():
+            return None
+        hours = task.get('estimated_hours')
+        if isinstance(hours, bool) or not isinstance(hours, (int, float)):
+            hours = None
+        due_date = task.get('due_date')
+        if not isinstance(due_date, str) or not re.fullmatch(r'\d{4}-\d{2}-\d{2}', due_date):
+            due_date = None
+        return {'description': description.strip(), 'estimated_hours': hours, 'due_date': due_date}
+
+    def _task_callback(self, on_task):
+        """Adapt on_task to raw streamed elements, passing on only valid tasks."""
+        def on_item(item):
+            task = self._validate_task(item)
+            if task and on_task:
+                on_task(task)
+        return on_item
 
     # ------------------------------------------------------------------
     # Profile learning
@@ -276,6 +774,13 @@ Example:
     def extract_profile_updates(self, conversation_history: list, category: str) -> dict:
         """Analyze conversation and extract facts to update user profile."""
 
+        text = self._create_text('extract_profile_updates',
+                                 self._profile_updates_request(conversation_history, category))
+        return self._parse_profile_updates(text)
+
+    def _profile_updates_request(self, conversation_history: list, category: str) -> dict:
+        """messages.create arguments for extract_profile_updates."""
+
         conversation_text = "\n".join([
             f"{msg['role']}: {msg['content']}"
             for msg in conversation_history
@@ -293,25 +798,295 @@ Extract generally-true facts (not goal-specific):
 - Skills, strengths, weaknesses
 - Time availability, constraints
 
-Return ONLY a JSON object. Field names:
-- current_role, experience_years (number), current_company
-- strengths (array), weaknesses (array)
-- target_companies (array), target_roles (array)
-- availability_hours_per_day (number)
-
-Only include fields explicitly mentioned. Empty object if nothing to extract.
+Record them with the update_profile tool. Only include fields explicitly
+mentioned; call it with no fields if there is nothing to extract.
 """
 
-        message = self.client.messages.create(
+        return dict(
             model=self.model,
             max_tokens=500,
+            tools=[PROFILE_TOOL],
+            tool_choice={"type": "tool", "name": PROFILE_TOOL["name"]},
             messages=[{"role": "user", "content": prompt}]
         )
 
-        json_match = re.search(r'\{.*\}', message.content[0].text, re.DOTALL)
-        if json_match:
+    def _parse_profile_updates(self, response: str) -> dict:
+        """update_profile input JSON, keeping only fields the schema knows."""
+        try:
+            updates = json.loads(response)
+        except json.JSONDecodeError:
+            return {}
+        if not isinstance(updates, dict):
+            return {}
+        fields = PROFILE_TOOL["input_schema"]["properties"]
+        return {key: value for key, value in updates.items() if key in fields}
+
+
+class AsyncAgent:
+    """Runs independent Agent calls concurrently on the async Anthropic client.
+
+    Prompts and response parsing come from the wrapped Agent; only the
+    transport differs. Methods return coroutines, to be driven by run().
+    """
+
+    def __init__(self, agent: Agent):
+        self.agent = agent
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from anthropic import AsyncAnthropic
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            self._client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"),
+                                          base_url=self.agent.base_url, max_retries=0)
+        return self._client
+
+    def run(self, *calls, timeout: float = None) -> list:
+        """Run coroutines concurrently and return their results in order.
+
+        If the timeout expires or any call raises, the others are cancelled
+        and the exception (TimeoutError on timeout) propagates.
+        """
+        # Imported here: asyncio costs every offline command ~30 ms at startup
+        import asyncio
+
+        async def gather():
+            tasks = [asyncio.ensure_future(call) for call in calls]
             try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError:
-                return {}
-        return {}
+                return await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # The client's connection pool belongs to this event loop
+                await self.client.close()
+                self._client = None
+
+        return asyncio.run(gather())
+
+    @staticmethod
+    async def optional(call, default):
+        """Await call, returning default instead of raising.
+
+        For a call whose failure shouldn't fail the others in run().
+        """
+        try:
+            return await call
+        except Exception:
+            return default
+
+    async def _create_text(self, method: str, request: dict) -> str:
+        """Async Agent._create_text, sharing the agent's response cache."""
+        ttl = self.agent._cache_ttl(method)
+        if ttl:
+            cached = self.agent.response_cache.get(request)
+            if cached is not None:
+                return cached
+
+        tokens = estimate_request_tokens(request)
+        with span("llm.create", model=request["model"]) as attrs:
+            message = await self.agent.scheduler.acall(
+                lambda timeout: self.client.messages.create(**request, timeout=timeout),
+                tokens
+            )
+            _usage_attrs(attrs, message.usage)
+        self.agent.scheduler.settle(tokens, message.usage.input_tokens + message.usage.output_tokens)
+        text = self.agent._reply_text(message)
+        if ttl:
+            self.agent.response_cache.put(request, text, ttl)
+        return text
+
+    async def _create_tool_input(self, method: str, request: dict, on_item) -> str:
+        """Async Agent._create_tool_input, sharing the agent's response cache."""
+        parser = JSONArrayStreamParser()
+        ttl = self.agent._cache_ttl(method)
+        if ttl:
+            cached = self.agent.response_cache.get(request)
+            if cached is not None:
+                for item in parser.feed(cached):
+                    on_item(item)
+                return cached
+
+        tokens = estimate_request_tokens(request)
+        started = time.perf_counter()
+        with span("llm.stream", model=request["model"]) as attrs:
+            async with await self.agent.scheduler.acall(
+                lambda timeout: self.client.messages.stream(**request, timeout=timeout).__aenter__(),
+                tokens
+            ) as stream:
+                async for event in stream:
+                    if event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+                        _first_byte(attrs, started)
+                        for item in parser.feed(event.delta.partial_json):
+                            on_item(item)
+                message = await stream.get_final_message()
+                _usage_attrs(attrs, message.usage)
+        self.agent.scheduler.settle(tokens, message.usage.input_tokens + message.usage.output_tokens)
+
+        text = self.agent._reply_text(message)
+        if ttl and message.stop_reason != "max_tokens":
+            self.agent.response_cache.put(request, text, ttl)
+        return text
+
+    async def generate_tasks_from_context(self, goal_name: str, goal_description: str,
+                                          goal_context: str, user_profile: dict,
+                                          deadline: str = None, on_task=None) -> list:
+        """Async Agent.generate_tasks_from_context."""
+        text = await self._create_tool_input(
+            'generate_tasks_from_context',
+            self.agent._generate_tasks_request(goal_name, goal_description, goal_context,
+                                               user_profile, deadline),
+            on_item=self.agent._task_callback(on_task)
+        )
+        return self.agent._parse_tasks(text)
+
+    async def extract_profile_updates(self, conversation_history: list, category: str) -> dict:
+        """Async Agent.extract_profile_updates."""
+        text = await self._create_text('extract_profile_updates',
+                                       self.agent._profile_updates_request(conversation_history, category))
+        return self.agent._parse_profile_updates(text)
+
+
+class TaskSpeculator:
+    """Runs the end-of-discovery LLM calls in the background while the user talks.
+
+    start() is called with the conversation so far after each turn and
+    kicks off profile extraction and task generation for that state; it
+    cancels any earlier in-flight run, since that one is now stale. When
+    the user confirms, get() hands back the run for exactly that
+    conversation state (finished or still going), or None.
+
+    Requests run on a private event loop thread with their own async
+    client, independent of AsyncAgent.run().
+    """
+
+    def __init__(self, agent: Agent):
+        import asyncio
+
+        self.async_agent = AsyncAgent(agent)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self._goal_context = None
+        self._future = None
+
+    def start(self, message_history: list, category: str, goal_name: str,
+              goal_description: str, goal_context: str, user_profile: dict,
+              deadline: str = None):
+        """Begin extracting profile updates and generating tasks for this state."""
+        import asyncio
+
+        self.cancel()
+
+        async def both():
+            return await asyncio.gather(
+                AsyncAgent.optional(
+                    self.async_agent.extract_profile_updates(list(message_history), category), {}
+                ),
+                self.async_agent.generate_tasks_from_context(
+                    goal_name, goal_description, goal_context, user_profile, deadline
+                ),
+            )
+
+        self._goal_context = goal_context
+        self._future = asyncio.run_coroutine_threadsafe(both(), self.loop)
+
+    def cancel(self):
+        """Drop the in-flight run, if any."""
+        if self._future is not None:
+            self._future.cancel()
+        self._future = None
+        self._goal_context = None
+
+    def get(self, goal_context: str) -> Optional["concurrent.futures.Future"]:
+        """Future of (profile_updates, tasks) for goal_context, or None if not started."""
+        if self._future is not None and goal_context == self._goal_context:
+            return self._future
+        return None
+
+    def close(self):
+        """Cancel outstanding work and stop the loop thread."""
+        import asyncio
+
+        self.cancel()
+        if self.async_agent._client is not None:
+            asyncio.run_coroutine_threadsafe(
+                self.async_agent._client.close(), self.loop
+            ).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+class InteractivePromptBuilder:
+    """Keeps the interactive system prompt fresh by re-rendering only stale sections.
+
+    Each section is loaded and rendered on its own and cached as a fragment.
+    Subscribe on_change to Database change events (or call invalidate) and
+    the next system_blocks() call reloads just the sections that changed.
+
+    The prompt goes out as two cacheable blocks: the profile and goals,
+    which rarely change mid-session, then the task lists. Completing a task
+    therefore leaves the first block's cache entry intact.
+    """
+
+    STABLE_SECTIONS = ('profile', 'goals')
+    TASK_SECTIONS = ('overdue', 'today', 'active')
+
+    def __init__(self, agent: Agent, loaders: dict):
+        """loaders maps each section name to a no-argument callable returning its data."""
+        self.agent = agent
+        self.loaders = loaders
+        self.fragments = {}
+        self.stale = set(self.STABLE_SECTIONS + self.TASK_SECTIONS)
+
+    def invalidate(self, *sections):
+        """Mark sections for reload (all of them if none are given)."""
+        self.stale.update(sections or self.STABLE_SECTIONS + self.TASK_SECTIONS)
+
+    def on_change(self, event: str, details: dict):
+        """Database listener: work out which sections an event touches."""
+        if event == 'goal_added':
+            self.invalidate('goals')
+        elif event in ('goal_deleted', 'goals_archived', 'goal_restored'):
+            self.invalidate('goals', *self.TASK_SECTIONS)
+        elif event == 'goal_updated' and 'status' in details:
+            self.invalidate('goals')
+        elif event in ('task_added', 'tasks_added'):
+            # A new task only lands in overdue/today if its due date says so
+            today = self.agent._today()
+            self.stale.add('active')
+            for due_date in details.get('due_dates', ()):
+                if due_date == today:
+                    self.stale.add('today')
+                elif due_date and due_date < today:
+                    self.stale.add('overdue')
+        elif event.startswith('task_'):
+            self.invalidate(*self.TASK_SECTIONS)
+
+    def _refresh(self):
+        for section in self.stale:
+            data = self.loaders[section]()
+            self.fragments[section] = self.agent.interactive_section(section, data)
+        self.stale.clear()
+
+    def text(self) -> str:
+        """The full prompt as a single string."""
+        self._refresh()
+        return "".join(self.fragments[s] for s in self.STABLE_SECTIONS + self.TASK_SECTIONS)
+
+    def system_blocks(self) -> list:
+        """The prompt as cacheable system blocks, for conversation_turn."""
+        self._refresh()
+        blocks = []
+        for group in (self.STABLE_SECTIONS, self.TASK_SECTIONS):
+            text = "".join(self.fragments[s] for s in group)
+            if text:
+                blocks.append({
+                    "type": "text",
+                    "text": text,
+                    "cache_control": {"type": "ephemeral"},
+                })
+        return blocks
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import Database
+
+
+def _day(offset: int = 0, today: str = None) -> str:
+    base = datetime.strptime(today, "%Y-%m-%d") if today else datetime.now()
+    return (base + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+class Analytics:
+    """Time-tracking reports over the daily_logs rollups.
+
+    Every query reads log_daily_rollup (one row per day and goal) or
+    log_task_rollup (one row per task), which triggers keep current as
+    logs are written, so reports cost the same however many logs exist.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def hours_by_day(self, days: int = 14, today: str = None) -> List[Dict]:
+        """[{'date', 'hours'}] for the last days days, oldest first, zeros included."""
+        since = _day(-(days - 1), today)
+        rows = self.db.conn.execute(
+            """SELECT date, SUM(hours) AS hours FROM log_daily_rollup
+               WHERE date >= ? GROUP BY date""",
+            (since,)
+        ).fetchall()
+        hours = {row['date']: row['hours'] for row in rows}
+        dates = [_day(-offset, today) for offset in range(days - 1, -1, -1)]
+        return [{'date': date, 'hours': hours.get(date, 0.0)} for date in dates]
+
+    def hours_by_week(self, weeks: int = 8, today: str = None) -> List[Dict]:
+        """[{'week' (its Monday), 'hours'}] for the last weeks weeks, oldest first."""
+        monday = datetime.strptime(_day(0, today), "%Y-%m-%d")
+        monday -= timedelta(days=monday.weekday())
+        starts = [(monday - timedelta(weeks=n)).strftime("%Y-%m-%d") for n in range(weeks - 1, -1, -1)]
+        rows = self.db.conn.execute(
+            # 'weekday 0' moves to the next Sunday (or stays on one); -6 days is its Monday
+            """SELECT date(date, 'weekday 0', '-6 days') AS week, SUM(hours) AS hours
+               FROM log_daily_rollup WHERE date >= ? GROUP BY week""",
+            (starts[0],)
+        ).fetchall()
+        hours = {row['week']: row['hours'] for row in rows}
+        return [{'week': week, 'hours': hours.get(week, 0.0)} for week in starts]
+
+    def hours_by_goal(self, since: str = None) -> List[Dict]:
+        """[{'goal_id', 'name', 'hours'}] logged since a date (default: ever), most first."""
+        rows = self.db.conn.execute(
+            """SELECT r.goal_id, COALESCE(g.name, a.name, '(no goal)') AS name, SUM(r.hours) AS hours
+               FROM log_daily_rollup r
+               LEFT JOIN goals g ON g.id = r.goal_id
+               LEFT JOIN goals_archive a ON a.id = r.goal_id
+               WHERE r.date >= ?
+               GROUP BY r.goal_id HAVING SUM(r.hours) > 0
+               ORDER BY hours DESC""",
+            (since or "",)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def estimate_accuracy(self) -> List[Dict]:
+        """Estimated vs logged hours on completed tasks, per goal.
+
+        Returns [{'goal_id', 'name', 'tasks', 'estimated', 'actual', 'ratio'}],
+        where ratio is actual / estimated (above 1 means underestimating).
+        Only tasks with both an estimate and logged time count.
+        """
+        # Completed goals are exactly what gets archived, so each task and
+        # goal is looked up in the live table, then the archive
+        rows = self.db.conn.execute(
+            """SELECT COALESCE(t.goal_id, ta.goal_id) AS goal_id,
+                      COALESCE(g.name, ga.name) AS name, COUNT(*) AS tasks,
+                      SUM(COALESCE(t.estimated_hours, ta.estimated_hours)) AS estimated,
+                      SUM(r.hours) AS actual
+               FROM log_task_rollup r
+               LEFT JOIN tasks t ON t.id = r.task_id
+               LEFT JOIN tasks_archive ta ON ta.id = r.task_id
+               LEFT JOIN goals g ON g.id = COALESCE(t.goal_id, ta.goal_id)
+               LEFT JOIN goals_archive ga ON ga.id = COALESCE(t.goal_id, ta.goal_id)
+               WHERE COALESCE(t.status, ta.status) = 'done'
+                 AND COALESCE(t.estimated_hours, ta.estimated_hours) > 0
+                 AND r.hours > 0
+                 AND COALESCE(g.name, ga.name) IS NOT NULL
+               GROUP BY 1
+               ORDER BY name"""
+        ).fetchall()
+        return [{**dict(row), 'ratio': row['actual'] / row['estimated']} for row in rows]
+
+    def task_hours(self, task_id: int) -> Optional[Dict]:
+        """{'description', 'estimated_hours', 'logged_hours', 'entries'} for a task, or None."""
+        row = self.db.conn.execute(
+            """SELECT t.description, t.estimated_hours,
+                      COALESCE(r.hours, 0) AS logged_hours, COALESCE(r.entries, 0) AS entries
+               FROM tasks t LEFT JOIN log_task_rollup r ON r.task_id = t.id
+               WHERE t.id = ?""",
+            (task_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def streaks(self, today: str = None) -> Dict:
+        """{'current', 'longest'} runs of consecutive days with time logged.
+
+        The current streak still counts if today has nothing logged yet but
+        yesterday does.
+        """
+        dates = [row['date'] for row in self.db.conn.execute(
+            """SELECT date FROM log_daily_rollup
+               GROUP BY date HAVING SUM(hours) > 0 ORDER BY date"""
+        )]
+        longest = run = 0
+        previous = None
+        for date in dates:
+            day = datetime.strptime(date, "%Y-%m-%d")
+            run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+            longest = max(longest, run)
+            previous = day
+
+        current = 0
+        if dates and dates[-1] in (_day(0, today), _day(-1, today)):
+            current = run
+        return {'current': current, 'longest': longest}
@@ -0,0 +1,146 @@
+"""Offline latency benchmark for Compass's conversational flows.
+
+Starts mock_server.MockAnthropicServer, points Agent at it and drives
+interactive mode, check-in and the new-goal flow through scripted
+sessions, then reports p50/p99 latency for each kind of turn.
+
+    python bench.py --runs 20 --latency 0.8 --jitter 0.2
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+
+from click.testing import CliRunner
+
+from mock_server import MockAnthropicServer
+
+
+SESSIONS = {
+    "interactive": ([], "I haven't started the first task yet\n"
+                        "what should I do first?\n"
+                        "/done 1\n"
+                        "ok, on to the next one\n"
+                        "quit\n"),
+    "checkin": (["checkin"], "working on the project\n"
+                             "yes, two hours tonight\n"
+                             "done\n"),
+    "new-goal": (["new", "Bench goal"], "y\n"
+                                        "I'm a backend developer\n"
+                                        "about three months\n"
+                                        "go\n"
+                                        "y\n"),
+}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    """Times the Agent calls that sit between a user's input and the reply."""
+
+    def __init__(self):
+        self.flow = None
+        self.samples = defaultdict(list)
+
+    def add(self, op, seconds):
+        self.samples[(self.flow, op)].append(seconds)
+
+    def wrap(self, obj, name, op):
+        original = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(op, time.perf_counter() - start)
+
+        setattr(obj, name, timed)
+
+    def wrap_stream(self, obj, name):
+        original = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            first = None
+            for chunk in original(*args, **kwargs):
+                if first is None:
+                    first = time.perf_counter() - start
+                    self.add("turn (first token)", first)
+                yield chunk
+            self.add("turn (complete)", time.perf_counter() - start)
+
+        setattr(obj, name, timed)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="compass-bench-")
+    os.environ["HOME"] = workdir
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+    os.chdir(workdir)
+
+    import main
+    from agent import Agent, AsyncAgent
+    from scheduler import RequestScheduler
+
+    server = MockAnthropicServer(latency=args.latency, jitter=args.jitter,
+                                 tokens_per_second=args.tokens_per_second).start()
+
+    # No response cache: every run should pay for its round trips. The mock
+    # has no rate limits, so neither does the scheduler.
+    agent = Agent(base_url=server.base_url,
+                  scheduler=RequestScheduler(requests_per_minute=1e6, tokens_per_minute=1e9))
+    async_agent = AsyncAgent(agent)
+    main.agent._obj = agent
+    main.async_agent._obj = async_agent
+
+    recorder = Recorder()
+    recorder.wrap_stream(agent, "stream_conversation_turn")
+    recorder.wrap(agent, "conversation_turn", "turn (complete)")
+    recorder.wrap(agent, "daily_checkin_greeting", "greeting")
+    recorder.wrap(agent, "goal_discovery_greeting", "greeting")
+    recorder.wrap(async_agent, "run", "generate tasks")
+
+    main.profile.save({"general": {"name": "Bench"}, "career": {"current_role": "Engineer"}})
+    runner = CliRunner()
+
+    for _ in range(args.runs):
+        # Fresh tasks so /done and the dashboards have something to show
+        goal_id = main.db.add_goal("Existing goal")
+        main.db.add_tasks_bulk(goal_id, [{"description": f"Task {i}"} for i in range(5)])
+
+        for flow, (cli_args, script) in SESSIONS.items():
+            recorder.flow = flow
+            start = time.perf_counter()
+            result = runner.invoke(main.cli, cli_args, input=script)
+            if result.exception:
+                raise result.exception
+            recorder.add("session", time.perf_counter() - start)
+
+    server.stop()
+
+    print(f"\n  {args.runs} runs | latency {args.latency}s ± {args.jitter}s | "
+          f"{args.tokens_per_second:g} tok/s | {server.requests} requests\n")
+    print(f"  {'flow':<12} {'operation':<20} {'n':>4} {'p50 ms':>8} {'p99 ms':>8}")
+    for (flow, op), samples in sorted(recorder.samples.items()):
+        print(f"  {flow:<12} {op:<20} {len(samples):>4} "
+              f"{percentile(samples, 50) * 1000:>8.0f} {percentile(samples, 99) * 1000:>8.0f}")
+    print()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to first byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds on latency")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    run(parser.parse_args())
@@ -0,0 +1,112 @@
+"""Concurrent-writer benchmark for Database connection profiles.
+
+Starts N writer processes per profile in CONNECTION_PROFILES, each
+committing one add_task at a time against the same database file, and
+reports commits/s and how many commits hit "database is locked".
+
+The file must be on real disk: tmpfs (and most of /tmp on some systems)
+makes fsync free, which hides exactly what synchronous=NORMAL saves.
+
+    python bench_db.py --writers 4 --commits 200 --dir ~/bench
+"""
+
+import os
+import sys
+import time
+import argparse
+import shutil
+import sqlite3
+import tempfile
+import multiprocessing
+
+
+def filesystem_type(path):
+    """The mount type path lives on, from /proc/mounts (None if unknown)."""
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best = ("", None)
+    for mount_point, fs_type in mounts:
+        prefix = mount_point.rstrip("/") + "/"
+        if (path + "/").startswith(prefix) and len(mount_point) > len(best[0]):
+            best = (mount_point, fs_type)
+    return best[1]
+
+
+def writer(db_path, profile, commits, start, results):
+    from database import Database
+
+    db = Database(db_path, connection_profile=profile)
+    goal_id = db.get_all_goals()[0]["id"]
+    locked = 0
+    start.wait()
+    t0 = time.perf_counter()
+    for i in range(commits):
+        while True:
+            try:
+                db.add_task(goal_id, f"task {os.getpid()}-{i}")
+                break
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                db.conn.rollback()
+                locked += 1
+                time.sleep(0.001)
+    results.put((time.perf_counter() - t0, locked))
+
+
+def run_profile(profile, args):
+    from database import Database
+
+    workdir = tempfile.mkdtemp(prefix=f"compass-bench-db-{profile}-", dir=args.dir)
+    db_path = os.path.join(workdir, "agent.db")
+    Database(db_path, connection_profile=profile).add_goal("Bench goal")
+
+    ctx = multiprocessing.get_context("spawn")
+    start = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=writer, args=(db_path, profile, args.commits, start, results))
+             for _ in range(args.writers)]
+    for p in procs:
+        p.start()
+    time.sleep(1.0)  # let every writer open its connection first
+    t0 = time.perf_counter()
+    start.set()
+    outcomes = [results.get() for _ in procs]
+    elapsed = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    shutil.rmtree(workdir)
+
+    total = args.writers * args.commits
+    locked = sum(n for _, n in outcomes)
+    slowest = max(seconds for seconds, _ in outcomes)
+    print(f"  {profile:<10} {total / elapsed:>10.0f} {slowest / args.commits * 1000:>15.2f} {locked:>8}")
+
+
+def run(args):
+    fs_type = filesystem_type(args.dir)
+    print(f"\n  {args.writers} writers x {args.commits} commits | {os.path.abspath(args.dir)}"
+          f"{f' ({fs_type})' if fs_type else ''}\n")
+    if fs_type in ("tmpfs", "ramfs"):
+        print("  warning: tmpfs has no real fsync; numbers won't show the durability cost\n")
+    print(f"  {'profile':<10} {'commits/s':>10} {'ms/commit (max)':>15} {'locked':>8}")
+
+    from database import CONNECTION_PROFILES
+    for profile in args.profiles or CONNECTION_PROFILES:
+        run_profile(profile, args)
+    print()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--commits", type=int, default=200, help="commits per writer")
+    parser.add_argument("--dir", default=".", help="where to create the databases (real disk, not tmpfs)")
+    parser.add_argument("--profile", dest="profiles", action="append",
+                        help="profile to run (repeatable; default: all)")
+    run(parser.parse_args())
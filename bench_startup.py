@@ -0,0 +1,98 @@
+"""Startup-time benchmark for offline compass commands.
+
+Runs each subcommand in a fresh interpreter (as the compass entry point
+does) against a scratch HOME and agent.db, and reports the best and
+median wall-clock time next to a bare `import click, sqlite3` baseline.
+Then breaks down `import main` with -X importtime and checks that no
+offline command pulls in the anthropic SDK.
+
+    python bench_startup.py --runs 10 --target-ms 100
+
+Exits non-zero if any command's best time is over the target.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = [
+    ["--help"],
+    ["list-goals"],
+    ["list-tasks", "1"],
+    ["status"],
+    ["done", "1"],
+    ["stats"],
+    ["search", "scales"],
+]
+
+RUN_CLI = "import sys; from main import cli; sys.argv[0] = 'compass'; cli()"
+SEED = ("from database import Database; db = Database(); "
+        "goal_id = db.add_goal('Learn piano'); db.add_task(goal_id, 'Practice scales', 1)")
+
+
+def time_command(code, args, env, cwd, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code, *args], env=env, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples), statistics.median(samples)
+
+
+def import_times(code, env, cwd):
+    """{module: (self_us, cumulative_us)} from -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, cwd=cwd,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="compass-bench-startup-")
+    env = {**os.environ, "HOME": workdir, "PYTHONPATH": HERE, "ANTHROPIC_API_KEY": "bench"}
+    env.pop("COMPASS_TRACE", None)
+    subprocess.run([sys.executable, "-c", SEED], env=env, cwd=workdir, check=True)
+
+    print(f"\n  {args.runs} runs each | target {args.target_ms:g} ms | {sys.executable}\n")
+    print(f"  {'command':<28} {'best ms':>8} {'median ms':>10}")
+    best, median = time_command("import click, sqlite3", [], env, workdir, args.runs)
+    print(f"  {'(import click, sqlite3)':<28} {best:>8.0f} {median:>10.0f}")
+
+    over = []
+    for command in COMMANDS:
+        best, median = time_command(RUN_CLI, command, env, workdir, args.runs)
+        flag = "  over target" if best > args.target_ms else ""
+        print(f"  {' '.join(command):<28} {best:>8.0f} {median:>10.0f}{flag}")
+        if flag:
+            over.append(command)
+
+    modules = import_times("import main", env, workdir)
+    print(f"\n  import main: {modules['main'][1] / 1000:.1f} ms cumulative. Slowest imports (self time):")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"    {name:<40} {self_us / 1000:>6.1f} ms self {cumulative_us / 1000:>7.1f} ms total")
+
+    heavy = [name for name in ("anthropic", "httpx", "dotenv") if name in modules]
+    if heavy:
+        print(f"\n  warning: import main pulls in {', '.join(heavy)}; offline commands should not")
+    print()
+    return 1 if over or heavy else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=100.0)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    sys.exit(run(parser.parse_args()))
@@ -1,75 +1,566 @@
+import re
+import json
+import math
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+
+# Secondary indexes, keyed by name.
+INDEXES = {
+    "idx_goals_status_created": "goals (status, created_at)",
+    "idx_tasks_goal_status": "tasks (goal_id, status)",
+    "idx_tasks_due_status": "tasks (due_date, status)",
+    "idx_tasks_completed_at": "tasks (completed_at)",
+    # Partial indexes serve the "status != 'done'" filters, which a plain
+    # index on status can't satisfy.
+    "idx_tasks_active_created": "tasks (created_at) WHERE status != 'done'",
+    "idx_tasks_active_due": "tasks (due_date) WHERE status != 'done'",
+    "idx_daily_logs_task": "daily_logs (task_id)",
+    "idx_daily_logs_date": "daily_logs (date)",
+}
+
+
+# ----------------------------------------------------------------------
+# Schema migrations
+#
+# Each migration takes a connection and brings the schema from version
+# N-1 to N, where N is its 1-based position in MIGRATIONS. The applied
+# version is stored in PRAGMA user_version. Append new migrations to the
+# end; never edit or reorder ones that have shipped.
+# ----------------------------------------------------------------------
+
+def _migrate_base_tables(conn: sqlite3.Connection):
+    """Create goals, tasks and daily_logs (adopting pre-versioned databases)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            deadline DATE,
+            status TEXT DEFAULT 'active',
+            category TEXT DEFAULT 'general',
+            context TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Databases created before category/context existed
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(goals)")}
+    if 'category' not in columns:
+        conn.execute("ALTER TABLE goals ADD COLUMN category TEXT DEFAULT 'general'")
+    if 'context' not in columns:
+        conn.execute("ALTER TABLE goals ADD COLUMN context TEXT")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            description TEXT NOT NULL,
+            status TEXT DEFAULT 'todo',
+            estimated_hours REAL,
+            due_date DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL,
+            task_id INTEGER,
+            hours_spent REAL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (task_id) REFERENCES tasks (id)
+        )
+    """)
+
+
+def _migrate_indexes(conn: sqlite3.Connection):
+    """Create the secondary indexes in INDEXES"""
+    for name, definition in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def _migrate_checkin_greetings(conn: sqlite3.Connection):
+    """Create checkin_greetings, which holds pre-generated check-in openers"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS checkin_greetings (
+            date DATE PRIMARY KEY,
+            greeting TEXT NOT NULL,
+            batch_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+# Check-in snapshot: which tasks are due today, overdue, or were completed
+# yesterday, relative to the date in checkin_snapshot_meta. Each kind is a
+# condition on a tasks row {t} and the meta row d. Triggers re-evaluate a
+# task on every write; Database.refresh_checkin_snapshot() rebuilds the
+# whole table when the date rolls over.
+SNAPSHOT_KINDS = {
+    "today": "{t}.due_date = d.date",
+    "overdue": "{t}.due_date < d.date AND {t}.status != 'done'",
+    # completed_at is UTC and d.date a local date: compare against that
+    # day's local midnights in UTC. Range on the raw column (not DATE()) so
+    # idx_tasks_completed_at applies.
+    "yesterday": ("{t}.completed_at >= datetime(d.date, '-1 day', 'utc') "
+                  "AND {t}.completed_at < datetime(d.date, 'utc')"),
+}
+
+
+def _migrate_checkin_snapshot(conn: sqlite3.Connection):
+    """Create checkin_snapshot and the triggers that maintain it"""
+    conn.execute("CREATE TABLE IF NOT EXISTS checkin_snapshot_meta (date DATE)")
+    # NULL date: the first read builds the snapshot
+    conn.execute("INSERT INTO checkin_snapshot_meta (date) VALUES (NULL)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS checkin_snapshot (
+            kind TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            PRIMARY KEY (kind, task_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_checkin_snapshot_task ON checkin_snapshot (task_id)")
+    _create_checkin_snapshot_triggers(conn)
+
+
+def _create_checkin_snapshot_triggers(conn: sqlite3.Connection):
+    """(Re)create the tasks triggers that keep checkin_snapshot current"""
+    for name in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS checkin_snapshot_task_{name}")
+    inserts = "".join(
+        f"""
+            INSERT INTO checkin_snapshot (kind, task_id)
+            SELECT '{kind}', NEW.id FROM checkin_snapshot_meta d
+            WHERE {condition.format(t='NEW')};"""
+        for kind, condition in SNAPSHOT_KINDS.items()
+    )
+    conn.execute(f"""
+        CREATE TRIGGER checkin_snapshot_task_insert
+        AFTER INSERT ON tasks BEGIN{inserts}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER checkin_snapshot_task_update
+        AFTER UPDATE OF due_date, status, completed_at ON tasks BEGIN
+            DELETE FROM checkin_snapshot WHERE task_id = OLD.id;{inserts}
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER checkin_snapshot_task_delete
+        AFTER DELETE ON tasks BEGIN
+            DELETE FROM checkin_snapshot WHERE task_id = OLD.id;
+        END
+    """)
+
+
+# Full-text search: one FTS5 table over task descriptions, goal names and
+# descriptions, goal conversation context and progress-log notes. Each
+# source row maps to FTS rowid id * 4 + code, so triggers can replace or
+# remove it without a lookup.
+SEARCH_KINDS = {"task": 0, "goal": 1, "context": 2, "log": 3}
+
+# Goal context is JSON ({'conversation': ...}); index the text, not the quoting
+_CONTEXT_TEXT = ("CASE WHEN json_valid({c}) THEN COALESCE(json_extract({c}, '$.conversation'), {c}) "
+                 "ELSE {c} END")
+
+
+def _search_row(kind: str, item_id: str, title: str, body: str) -> str:
+    """INSERT of one source row into search_index (item_id etc. are SQL expressions)"""
+    return (f"INSERT INTO search_index (rowid, kind, item_id, title, body) "
+            f"SELECT {item_id} * 4 + {SEARCH_KINDS[kind]}, '{kind}', {item_id}, {title}, {body}")
+
+
+def _migrate_search_index(conn: sqlite3.Connection):
+    """Create the search_index FTS5 table, its triggers, and index existing rows"""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            kind UNINDEXED, item_id UNINDEXED, title, body,
+            tokenize = 'porter unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+
+    def delete(kind, item_id):
+        return f"DELETE FROM search_index WHERE rowid = {item_id} * 4 + {SEARCH_KINDS[kind]}"
+
+    context = _CONTEXT_TEXT.format(c="NEW.context")
+    triggers = {
+        "search_task_insert": f"""AFTER INSERT ON tasks BEGIN
+            {_search_row('task', 'NEW.id', 'NEW.description', "''")};
+        END""",
+        "search_task_update": f"""AFTER UPDATE OF description ON tasks BEGIN
+            {delete('task', 'OLD.id')};
+            {_search_row('task', 'NEW.id', 'NEW.description', "''")};
+        END""",
+        "search_task_delete": f"""AFTER DELETE ON tasks BEGIN
+            {delete('task', 'OLD.id')};
+        END""",
+        "search_goal_insert": f"""AFTER INSERT ON goals BEGIN
+            {_search_row('goal', 'NEW.id', 'NEW.name', 'NEW.description')};
+            {_search_row('context', 'NEW.id', "''", context)} WHERE NEW.context IS NOT NULL;
+        END""",
+        "search_goal_update": f"""AFTER UPDATE OF name, description ON goals BEGIN
+            {delete('goal', 'OLD.id')};
+            {_search_row('goal', 'NEW.id', 'NEW.name', 'NEW.description')};
+        END""",
+        "search_goal_context_update": f"""AFTER UPDATE OF context ON goals BEGIN
+            {delete('context', 'OLD.id')};
+            {_search_row('context', 'NEW.id', "''", context)} WHERE NEW.context IS NOT NULL;
+        END""",
+        "search_goal_delete": f"""AFTER DELETE ON goals BEGIN
+            {delete('goal', 'OLD.id')};
+            {delete('context', 'OLD.id')};
+        END""",
+        "search_log_insert": f"""AFTER INSERT ON daily_logs BEGIN
+            {_search_row('log', 'NEW.id', "''", 'NEW.notes')} WHERE NEW.notes != '';
+        END""",
+        "search_log_update": f"""AFTER UPDATE OF notes ON daily_logs BEGIN
+            {delete('log', 'OLD.id')};
+            {_search_row('log', 'NEW.id', "''", 'NEW.notes')} WHERE NEW.notes != '';
+        END""",
+        "search_log_delete": f"""AFTER DELETE ON daily_logs BEGIN
+            {delete('log', 'OLD.id')};
+        END""",
+    }
+    for name, body in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    # Index what's already there
+    conn.execute("DELETE FROM search_index")
+    conn.execute(_search_row('task', 'id', 'description', "''") + " FROM tasks")
+    conn.execute(_search_row('goal', 'id', 'name', 'description') + " FROM goals")
+    conn.execute(_search_row('context', 'id', "''", _CONTEXT_TEXT.format(c='context'))
+                 + " FROM goals WHERE context IS NOT NULL")
+    conn.execute(_search_row('log', 'id', "''", 'notes') + " FROM daily_logs WHERE notes != ''")
+
+
+def _fts_query(text: str) -> str:
+    """Plain words to an FTS5 query: every word must match, the last as a prefix"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+# Keyset pagination walks tasks in (created_at, id) order
+PAGINATION_INDEXES = {
+    "idx_tasks_goal_created": "tasks (goal_id, created_at)",
+    "idx_tasks_created": "tasks (created_at)",
+}
+
+
+def _migrate_pagination_indexes(conn: sqlite3.Connection):
+    """Create the indexes in PAGINATION_INDEXES"""
+    for name, definition in PAGINATION_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+# Time-tracking rollups over daily_logs, kept current by triggers so
+# reports never rescan the logs: hours per (date, goal) and per task.
+# A log's goal is its task's goal at the time (0 if it has none).
+_LOG_GOAL = "COALESCE((SELECT goal_id FROM tasks WHERE id = {log}.task_id), 0)"
+
+
+def _log_rollup(log: str, sign: str) -> str:
+    """Statements adding (sign '+') or removing (sign '-') one log row from the rollups"""
+    hours = f"{sign}COALESCE({log}.hours_spent, 0)"
+    return f"""
+        INSERT INTO log_daily_rollup (date, goal_id, hours, entries)
+        VALUES ({log}.date, {_LOG_GOAL.format(log=log)}, {hours}, {sign}1)
+        ON CONFLICT (date, goal_id) DO UPDATE
+        SET hours = hours + excluded.hours, entries = entries + excluded.entries;
+        INSERT INTO log_task_rollup (task_id, hours, entries)
+        SELECT {log}.task_id, {hours}, {sign}1 WHERE {log}.task_id IS NOT NULL
+        ON CONFLICT (task_id) DO UPDATE
+        SET hours = hours + excluded.hours, entries = entries + excluded.entries;"""
+
+
+def _migrate_log_rollups(conn: sqlite3.Connection):
+    """Create the daily_logs rollup tables and triggers, and roll up existing logs"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_daily_rollup (
+            date DATE NOT NULL,
+            goal_id INTEGER NOT NULL,
+            hours REAL NOT NULL,
+            entries INTEGER NOT NULL,
+            PRIMARY KEY (date, goal_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_task_rollup (
+            task_id INTEGER PRIMARY KEY,
+            hours REAL NOT NULL,
+            entries INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS log_rollup_insert AFTER INSERT ON daily_logs BEGIN
+            {_log_rollup('NEW', '+')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS log_rollup_update
+        AFTER UPDATE OF date, task_id, hours_spent ON daily_logs BEGIN
+            {_log_rollup('OLD', '-')}
+            {_log_rollup('NEW', '+')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS log_rollup_delete AFTER DELETE ON daily_logs BEGIN
+            {_log_rollup('OLD', '-')}
+        END
+    """)
+
+    conn.execute("DELETE FROM log_daily_rollup")
+    conn.execute("DELETE FROM log_task_rollup")
+    conn.execute(f"""
+        INSERT INTO log_daily_rollup (date, goal_id, hours, entries)
+        SELECT date, {_LOG_GOAL.format(log='daily_logs')}, SUM(COALESCE(hours_spent, 0)), COUNT(*)
+        FROM daily_logs GROUP BY 1, 2
+    """)
+    conn.execute("""
+        INSERT INTO log_task_rollup (task_id, hours, entries)
+        SELECT task_id, SUM(COALESCE(hours_spent, 0)), COUNT(*)
+        FROM daily_logs WHERE task_id IS NOT NULL GROUP BY task_id
+    """)
+
+
+# Archive tables: finished goals move here with their tasks and logs,
+# keeping their IDs (AUTOINCREMENT never reuses them), so a restore is a
+# straight copy back. Column lists are shared by archive and restore.
+ARCHIVE_COLUMNS = {
+    "goals": "id, name, description, deadline, status, category, context, created_at",
+    "tasks": "id, goal_id, description, status, estimated_hours, due_date, created_at, completed_at",
+    "daily_logs": "id, date, task_id, hours_spent, notes, created_at",
+}
+
+
+def _migrate_archive(conn: sqlite3.Connection):
+    """Create the archive tables; keep archived logs in the time-tracking rollups"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS goals_archive (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            deadline DATE,
+            status TEXT,
+            category TEXT,
+            context TEXT,
+            created_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            goal_id INTEGER,
+            description TEXT NOT NULL,
+            status TEXT,
+            estimated_hours REAL,
+            due_date DATE,
+            created_at TIMESTAMP,
+            completed_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_logs_archive (
+            id INTEGER PRIMARY KEY,
+            date DATE NOT NULL,
+            task_id INTEGER,
+            hours_spent REAL,
+            notes TEXT,
+            created_at TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_goal ON tasks_archive (goal_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_logs_archive_task ON daily_logs_archive (task_id)")
+
+    # Moving a log between daily_logs and the archive is not new or lost
+    # time: the copy lands in the other table first, and the rollup
+    # triggers skip rows that exist there.
+    conn.execute("DROP TRIGGER IF EXISTS log_rollup_insert")
+    conn.execute("DROP TRIGGER IF EXISTS log_rollup_delete")
+    conn.execute(f"""
+        CREATE TRIGGER log_rollup_insert AFTER INSERT ON daily_logs
+        WHEN NOT EXISTS (SELECT 1 FROM daily_logs_archive WHERE id = NEW.id) BEGIN
+            {_log_rollup('NEW', '+')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER log_rollup_delete AFTER DELETE ON daily_logs
+        WHEN NOT EXISTS (SELECT 1 FROM daily_logs_archive WHERE id = OLD.id) BEGIN
+            {_log_rollup('OLD', '-')}
+        END
+    """)
+
+
+def _migrate_completed_at_utc(conn: sqlite3.Connection):
+    """Store completed_at in UTC, like every other timestamp column
+
+    complete_task used to write local time. Convert existing values and
+    rebuild the check-in snapshot, whose 'yesterday' range now converts
+    its local date to UTC.
+    """
+    for table in ("tasks", "tasks_archive"):
+        conn.execute(f"UPDATE {table} SET completed_at = datetime(completed_at, 'utc') "
+                     f"WHERE completed_at IS NOT NULL")
+    _create_checkin_snapshot_triggers(conn)
+    conn.execute("UPDATE checkin_snapshot_meta SET date = NULL")
+
+
+MIGRATIONS = [
+    _migrate_base_tables,
+    _migrate_indexes,
+    _migrate_checkin_greetings,
+    _migrate_checkin_snapshot,
+    _migrate_search_index,
+    _migrate_pagination_indexes,
+    _migrate_log_rollups,
+    _migrate_archive,
+    _migrate_completed_at_utc,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# ----------------------------------------------------------------------
+# Connection profiles
+#
+# PRAGMAs applied to every new connection. "default" uses WAL so readers
+# never block the writer, and synchronous=NORMAL so a commit doesn't
+# fsync (WAL stays consistent; only the last commits can be lost on power
+# failure). busy_timeout makes concurrent compass processes wait for the
+# write lock instead of failing with "database is locked".
+# ----------------------------------------------------------------------
+
+CONNECTION_PROFILES = {
+    # auto_vacuum only takes effect on a new database, and must be set
+    # before journal_mode creates it; older files are converted by the
+    # first Database.vacuum().
+    "default": {
+        "auto_vacuum": "incremental",
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "busy_timeout": 5000,           # ms
+        "cache_size": -16000,           # negative = KiB, so 16 MB
+        "mmap_size": 64 * 1024 * 1024,  # bytes
+        "temp_store": "memory",
+    },
+    # Durable commits, for databases on storage you don't trust
+    "safe": {
+        "auto_vacuum": "incremental",
+        "journal_mode": "wal",
+        "synchronous": "full",
+        "busy_timeout": 5000,
+        "cache_size": -16000,
+    },
+    # SQLite's own defaults (rollback journal, fsync on every commit)
+    "legacy": {},
+}
+
 
 class Database:
-    def __init__(self, db_path="agent.db"):
+    def __init__(self, db_path="agent.db", connection_profile="default"):
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
-        self.create_tables()
-    
-    def create_tables(self):
-        # Goals table
-        self.conn.execute("""
-            CREATE TABLE IF NOT EXISTS goals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                deadline DATE,
-                status TEXT DEFAULT 'active',
-                category TEXT DEFAULT 'general',
-                context TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        self._transaction_depth = 0
+        self._listeners = []
+        self.apply_connection_profile(connection_profile)
+        if self.schema_version() < SCHEMA_VERSION:
+            self.migrate()
 
-        # Add columns to existing tables if they don't exist (migration)
-        try:
-            self.conn.execute("ALTER TABLE goals ADD COLUMN category TEXT DEFAULT 'general'")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+    def apply_connection_profile(self, connection_profile):
+        """Apply a named profile from CONNECTION_PROFILES, or a dict of PRAGMAs"""
+        if isinstance(connection_profile, str):
+            if connection_profile not in CONNECTION_PROFILES:
+                raise ValueError(f"Unknown connection profile: {connection_profile}")
+            connection_profile = CONNECTION_PROFILES[connection_profile]
+        for pragma, value in connection_profile.items():
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+
+    def schema_version(self) -> int:
+        """Get the schema version stored in the database file"""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        """Apply pending migrations, each in its own transaction.
 
+        The version is re-read under a write lock so concurrent processes
+        starting against the same file don't apply a migration twice.
+        """
+        while True:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self.schema_version()
+                if version >= SCHEMA_VERSION:
+                    self.conn.rollback()
+                    return
+                MIGRATIONS[version](self.conn)
+                self.conn.execute(f"PRAGMA user_version = {version + 1}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one atomic commit.
+
+        Mutating methods called inside the block skip their own commit; the
+        whole block commits on exit or rolls back if it raises. Nested
+        blocks join the outermost transaction.
+        """
+        if self._transaction_depth:
+            self._transaction_depth += 1
+            try:
+                yield self
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._transaction_depth = 1
         try:
-            self.conn.execute("ALTER TABLE goals ADD COLUMN context TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        # Tasks table
-        self.conn.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                goal_id INTEGER,
-                description TEXT NOT NULL,
-                status TEXT DEFAULT 'todo',
-                estimated_hours REAL,
-                due_date DATE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                FOREIGN KEY (goal_id) REFERENCES goals (id)
-            )
-        """)
-        
-        # Daily logs table
-        self.conn.execute("""
-            CREATE TABLE IF NOT EXISTS daily_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE NOT NULL,
-                task_id INTEGER,
-                hours_spent REAL,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (task_id) REFERENCES tasks (id)
-            )
-        """)
-        
-        self.conn.commit()
-    
+            yield self
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._transaction_depth = 0
+
+    def subscribe(self, listener: Callable[[str, Dict], None]):
+        """Register a listener called as listener(event, details) after each write.
+
+        Events: goal_added, goal_updated, goal_deleted, goals_archived,
+        goal_restored, task_added, tasks_added, task_completed,
+        task_uncompleted, task_deleted, progress_logged. Inside transaction() they fire before the commit,
+        so listeners should only mark things stale, not read eagerly.
+        """
+        self._listeners.append(listener)
+
+    def _emit(self, event: str, **details):
+        for listener in self._listeners:
+            listener(event, details)
+
+    def _commit(self):
+        """Commit, unless a transaction() block will commit for us"""
+        if not self._transaction_depth:
+            self.conn.commit()
+
     def add_goal(self, name: str, description: str = "", deadline: str = None, category: str = "general", context: str = None) -> int:
         cursor = self.conn.execute(
             "INSERT INTO goals (name, description, deadline, category, context) VALUES (?, ?, ?, ?, ?)",
             (name, description, deadline, category, context)
         )
-        self.conn.commit()
+        self._commit()
+        self._emit("goal_added", goal_id=cursor.lastrowid)
         return cursor.lastrowid
     
     def get_all_goals(self, status: str = "active") -> List[Dict]:
@@ -84,9 +575,34 @@ class Database:
             "INSERT INTO tasks (goal_id, description, estimated_hours, due_date) VALUES (?, ?, ?, ?)",
             (goal_id, description, estimated_hours, due_date)
         )
-        self.conn.commit()
+        self._commit()
+        self._emit("task_added", task_ids=[cursor.lastrowid], due_dates=[due_date])
         return cursor.lastrowid
-    
+
+    def add_tasks_bulk(self, goal_id: int, tasks: Iterable[Dict]) -> List[int]:
+        """Insert many tasks for a goal in one transaction.
+
+        Each task is a dict with 'description' and optional 'estimated_hours'
+        and 'due_date' (the shape generate_tasks_from_context returns).
+        Returns the new task IDs in insertion order.
+        """
+        rows = [
+            (goal_id, t['description'], t.get('estimated_hours'), t.get('due_date'))
+            for t in tasks
+        ]
+        # Hold the write lock from the MAX(id) read through the insert, so
+        # every id above it belongs to this batch (AUTOINCREMENT never reuses).
+        with self.transaction():
+            last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM tasks").fetchone()[0]
+            self.conn.executemany(
+                "INSERT INTO tasks (goal_id, description, estimated_hours, due_date) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            cursor = self.conn.execute("SELECT id FROM tasks WHERE id > ? ORDER BY id", (last_id,))
+            task_ids = [row[0] for row in cursor.fetchall()]
+        self._emit("tasks_added", task_ids=task_ids, due_dates=[row[3] for row in rows])
+        return task_ids
+
     def get_tasks_for_goal(self, goal_id: int, status: str = None) -> List[Dict]:
         if status:
             cursor = self.conn.execute(
@@ -101,6 +617,10 @@ class Database:
         return [dict(row) for row in cursor.fetchall()]
     
     def log_progress(self, task_id: int, hours_spent: float, notes: str = "", date: str = None):
+        # The rollups add every logged value to their totals for good, so
+        # an inf, nan or negative entry would poison every report
+        if not (isinstance(hours_spent, (int, float)) and math.isfinite(hours_spent) and hours_spent > 0):
+            raise ValueError(f"hours_spent must be a positive number, not {hours_spent!r}")
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
         
@@ -108,65 +628,365 @@ class Database:
             "INSERT INTO daily_logs (date, task_id, hours_spent, notes) VALUES (?, ?, ?, ?)",
             (date, task_id, hours_spent, notes)
         )
-        self.conn.commit()
+        self._commit()
+        self._emit("progress_logged", task_id=task_id, date=date)
 
     def delete_task(self, task_id: int):
+      self.conn.execute("DELETE FROM daily_logs WHERE task_id = ?", (task_id,))
       self.conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-      self.conn.commit()
+      self._commit()
+      self._emit("task_deleted", task_id=task_id)
 
     def delete_goal(self, goal_id: int):
-      # Delete all tasks for this goal first
+      # Delete all logs and tasks for this goal first
+      self.conn.execute(
+          "DELETE FROM daily_logs WHERE task_id IN (SELECT id FROM tasks WHERE goal_id = ?)",
+          (goal_id,)
+      )
       self.conn.execute("DELETE FROM tasks WHERE goal_id = ?", (goal_id,))
       self.conn.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
-      self.conn.commit()
+      self._commit()
+      self._emit("goal_deleted", goal_id=goal_id)
 
 
     def complete_task(self, task_id: int):
       self.conn.execute(
-          "UPDATE tasks SET status = 'done', completed_at = ? WHERE id = ?",
-          (datetime.now(), task_id)
+          "UPDATE tasks SET status = 'done', completed_at = CURRENT_TIMESTAMP WHERE id = ?",
+          (task_id,)
       )
-      self.conn.commit()
+      self._commit()
+      self._emit("task_completed", task_id=task_id)
 
     def uncomplete_task(self, task_id: int):
       self.conn.execute(
           "UPDATE tasks SET status = 'todo', completed_at = NULL WHERE id = ?",
           (task_id,)
       )
-      self.conn.commit()
+      self._commit()
+      self._emit("task_uncompleted", task_id=task_id)
 
     def get_todays_tasks(self) -> List[Dict]:
         """Get all tasks due today"""
-        today = datetime.now().strftime("%Y-%m-%d")
+        return self._read_checkin_snapshot('today')['today']
+
+    def get_yesterdays_completed_tasks(self) -> List[Dict]:
+        """Get tasks completed yesterday"""
+        return self._read_checkin_snapshot('yesterday')['yesterday']
+
+    def get_overdue_tasks(self) -> List[Dict]:
+        """Get all tasks that are past due date and not completed"""
+        return self._read_checkin_snapshot('overdue')['overdue']
+
+    def get_checkin_context(self, date: str = None) -> Dict:
+        """Goals and task lists that a daily check-in on date (default today) is based on.
+
+        Today's lists come from the snapshot. Any other date (batch-checkin
+        preparing tomorrow's) is evaluated directly, leaving the snapshot
+        on today.
+        """
+        if date and date != datetime.now().strftime("%Y-%m-%d"):
+            snapshot = self._checkin_tasks_for(date)
+        else:
+            snapshot = self._read_checkin_snapshot()
+        return {
+            'goals': self.get_all_goals(),
+            'yesterday_tasks': snapshot['yesterday'],
+            'today_tasks': snapshot['today'],
+            'overdue_tasks': snapshot['overdue']
+        }
+
+    def refresh_checkin_snapshot(self, date: str = None):
+        """Roll the check-in snapshot over to date (default today) if needed.
+
+        Between rollovers the triggers keep it current, so this is one
+        single-row read except on the first call of a new day.
+        """
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        if self._checkin_snapshot_date() == date:
+            return
+        with self.transaction():
+            # Re-check under the write lock; another process may have rolled over
+            if self._checkin_snapshot_date() == date:
+                return
+            self.conn.execute("UPDATE checkin_snapshot_meta SET date = ?", (date,))
+            self.conn.execute("DELETE FROM checkin_snapshot")
+            for kind, condition in SNAPSHOT_KINDS.items():
+                self.conn.execute(
+                    f"""INSERT INTO checkin_snapshot (kind, task_id)
+                        SELECT ?, t.id FROM tasks t, checkin_snapshot_meta d
+                        WHERE {condition.format(t='t')}""",
+                    (kind,)
+                )
+
+    def _checkin_snapshot_date(self) -> Optional[str]:
+        return self.conn.execute("SELECT date FROM checkin_snapshot_meta").fetchone()[0]
+
+    def _read_checkin_snapshot(self, kind: str = None) -> Dict[str, List[Dict]]:
+        """Tasks in the current snapshot, grouped by kind (or just one kind)"""
+        self.refresh_checkin_snapshot()
+        cursor = self.conn.execute(
+            f"""SELECT s.kind, t.* FROM checkin_snapshot s
+                JOIN tasks t ON t.id = s.task_id
+                {"WHERE s.kind = ?" if kind else ""}
+                ORDER BY s.kind, CASE s.kind WHEN 'today' THEN t.created_at
+                                             WHEN 'overdue' THEN t.due_date
+                                             ELSE t.completed_at END""",
+            (kind,) if kind else ()
+        )
+        snapshot = {name: [] for name in SNAPSHOT_KINDS}
+        for row in cursor.fetchall():
+            task = dict(row)
+            snapshot[task.pop('kind')].append(task)
+        return snapshot
+
+    def _checkin_tasks_for(self, date: str) -> Dict[str, List[Dict]]:
+        """The snapshot's task lists as they would be on date, without touching it"""
+        order = {"today": "created_at", "overdue": "due_date", "yesterday": "completed_at"}
+        snapshot = {}
+        for kind, condition in SNAPSHOT_KINDS.items():
+            cursor = self.conn.execute(
+                f"""SELECT t.* FROM tasks t, (SELECT ? AS date) d
+                    WHERE {condition.format(t='t')}
+                    ORDER BY t.{order[kind]}""",
+                (date,)
+            )
+            snapshot[kind] = [dict(row) for row in cursor.fetchall()]
+        return snapshot
+
+    def save_checkin_greeting(self, date: str, greeting: str, batch_id: str = None):
+        """Store a pre-generated check-in greeting for date (YYYY-MM-DD)"""
+        self.conn.execute(
+            """INSERT OR REPLACE INTO checkin_greetings (date, greeting, batch_id)
+               VALUES (?, ?, ?)""",
+            (date, greeting, batch_id)
+        )
+        self._commit()
+
+    def take_checkin_greeting(self, date: str) -> Optional[str]:
+        """Remove and return the pre-generated greeting for date, if any.
+
+        Greetings for earlier dates are stale and are dropped as well.
+        """
+        with self.transaction():
+            row = self.conn.execute(
+                "SELECT greeting FROM checkin_greetings WHERE date = ?", (date,)
+            ).fetchone()
+            self.conn.execute("DELETE FROM checkin_greetings WHERE date <= ?", (date,))
+        return row['greeting'] if row else None
+
+    def search(self, query: str, limit: int = 20, highlight=("[", "]")) -> List[Dict]:
+        """Full-text search over tasks, goals, goal conversations and log notes.
+
+        query is plain words; all must appear (the last may be a prefix).
+        Returns the best matches first as dicts with 'kind' ('task', 'goal',
+        'context' or 'log'), 'id', 'goal_id', 'title', 'snippet' (matches
+        wrapped in the highlight pair) and 'rank' (lower is better).
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
         cursor = self.conn.execute(
-            "SELECT * FROM tasks WHERE due_date = ? ORDER BY created_at",
-            (today,)
+            """WITH hits AS (
+                   SELECT kind, item_id,
+                          snippet(search_index, -1, ?, ?, '…', 12) AS snippet,
+                          bm25(search_index, 0, 0, 4.0, 1.0) AS rank
+                   FROM search_index
+                   WHERE search_index MATCH ?
+                   ORDER BY rank
+                   LIMIT ?
+               )
+               SELECT h.kind, h.item_id AS id, h.snippet, h.rank,
+                      CASE h.kind WHEN 'task' THEN t.goal_id
+                                  WHEN 'log' THEN lt.goal_id
+                                  ELSE h.item_id END AS goal_id,
+                      CASE h.kind WHEN 'task' THEN t.description
+                                  WHEN 'log' THEN l.date || COALESCE(' — ' || lt.description, '')
+                                  ELSE g.name END AS title
+               FROM hits h
+               LEFT JOIN tasks t ON h.kind = 'task' AND t.id = h.item_id
+               LEFT JOIN goals g ON h.kind IN ('goal', 'context') AND g.id = h.item_id
+               LEFT JOIN daily_logs l ON h.kind = 'log' AND l.id = h.item_id
+               LEFT JOIN tasks lt ON lt.id = l.task_id
+               ORDER BY h.rank""",
+            (highlight[0], highlight[1], match, limit)
         )
         return [dict(row) for row in cursor.fetchall()]
 
-    def get_yesterdays_completed_tasks(self) -> List[Dict]:
-        """Get tasks completed yesterday"""
-        from datetime import timedelta
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    def get_tasks_page(self, goal_id: int = None, status: str = None, active_only: bool = False,
+                       after: Tuple = None, limit: int = 100) -> Tuple[List[Dict], Optional[Tuple]]:
+        """One page of tasks in (created_at, id) order.
+
+        Filters: goal_id, an exact status, or active_only (status != 'done').
+        after is the cursor returned with the previous page. Returns
+        (tasks, cursor), where cursor is None once there are no more pages.
+        Each page is an index range scan, however deep into the table.
+        """
+        clauses, params = [], []
+        if goal_id is not None:
+            clauses.append("goal_id = ?")
+            params.append(goal_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if active_only:
+            clauses.append("status != 'done'")
+        if after is not None:
+            clauses.append("(created_at, id) > (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        cursor = self.conn.execute(
+            f"SELECT * FROM tasks {where} ORDER BY created_at, id LIMIT ?",
+            (*params, limit)
+        )
+        tasks = [dict(row) for row in cursor.fetchall()]
+        if len(tasks) < limit:
+            return tasks, None
+        return tasks, (tasks[-1]['created_at'], tasks[-1]['id'])
+
+    def iter_tasks(self, goal_id: int = None, status: str = None, active_only: bool = False,
+                   page_size: int = 100) -> Iterator[Dict]:
+        """Yield tasks in (created_at, id) order, fetching a page at a time.
+
+        Takes the same filters as get_tasks_page. A caller that stops early
+        never fetches the remaining pages.
+        """
+        after = None
+        while True:
+            tasks, after = self.get_tasks_page(goal_id, status, active_only, after, page_size)
+            yield from tasks
+            if after is None:
+                return
+
+    def set_goal_status(self, goal_id: int, status: str):
+        """Set a goal's status ('active', 'completed', 'abandoned', ...)"""
+        self.conn.execute("UPDATE goals SET status = ? WHERE id = ?", (status, goal_id))
+        self._commit()
+        self._emit("goal_updated", goal_id=goal_id, status=status)
+
+    def get_archivable_goals(self, older_than_days: int = 30) -> List[Dict]:
+        """Goals the archive policy would move: finished, and idle for older_than_days.
+
+        Finished means no longer 'active', or every one of its tasks done.
+        Idle means no goal or task created, no task completed and no time
+        logged since the cutoff. Timestamps are UTC; a log's local date
+        counts from its midnight.
+        """
         cursor = self.conn.execute(
-            """SELECT t.* FROM tasks t
-               WHERE DATE(t.completed_at) = ?
-               ORDER BY t.completed_at""",
-            (yesterday,)
+            """SELECT g.*,
+                      COUNT(t.id) AS total_count,
+                      COALESCE(SUM(t.status = 'done'), 0) AS done_count,
+                      MAX(g.created_at, COALESCE(MAX(t.created_at), ''),
+                          COALESCE(MAX(t.completed_at), ''),
+                          COALESCE((SELECT datetime(MAX(l.date), 'utc')
+                                    FROM tasks lt JOIN daily_logs l ON l.task_id = lt.id
+                                    WHERE lt.goal_id = g.id), '')) AS last_activity
+               FROM goals g
+               LEFT JOIN tasks t ON t.goal_id = g.id
+               GROUP BY g.id
+               HAVING (g.status != 'active' OR (total_count > 0 AND done_count = total_count))
+                  AND last_activity <= datetime('now', ?)
+               ORDER BY last_activity""",
+            (f"-{older_than_days} days",)
         )
         return [dict(row) for row in cursor.fetchall()]
 
-    def get_overdue_tasks(self) -> List[Dict]:
-        """Get all tasks that are past due date and not completed"""
-        today = datetime.now().strftime("%Y-%m-%d")
+    def archive_goals(self, goal_ids: List[int]) -> Dict[str, int]:
+        """Move goals, their tasks and their logs into the archive tables.
+
+        Also sweeps daily_logs whose task no longer exists (left behind by
+        older versions of delete_task/delete_goal). Logged hours stay in
+        the time-tracking rollups. Returns counts of rows moved.
+        """
+        ids = json.dumps(list(goal_ids))
+        goals = "SELECT value FROM json_each(?)"
+        tasks = f"SELECT id FROM tasks WHERE goal_id IN ({goals})"
+        moves = [
+            ("daily_logs", f"task_id IN ({tasks})", (ids,)),
+            ("orphaned_logs", "task_id IS NULL OR task_id NOT IN (SELECT id FROM tasks)", ()),
+            ("tasks", f"goal_id IN ({goals})", (ids,)),
+            ("goals", f"id IN ({goals})", (ids,)),
+        ]
+        counts = {}
+        with self.transaction():
+            for name, where, params in moves:
+                table = "daily_logs" if name == "orphaned_logs" else name
+                columns = ARCHIVE_COLUMNS[table]
+                self.conn.execute(
+                    f"INSERT INTO {table}_archive ({columns}) SELECT {columns} FROM {table} WHERE {where}",
+                    params
+                )
+                counts[name] = self.conn.execute(f"DELETE FROM {table} WHERE {where}", params).rowcount
+        if counts["goals"]:
+            self._emit("goals_archived", goal_ids=list(goal_ids))
+        return counts
+
+    def get_archived_goals(self) -> List[Dict]:
+        """Archived goals, most recently archived first"""
         cursor = self.conn.execute(
-            """SELECT * FROM tasks
-               WHERE due_date < ? AND status != 'done'
-               ORDER BY due_date""",
-            (today,)
+            """SELECT g.*, COUNT(t.id) AS total_count
+               FROM goals_archive g
+               LEFT JOIN tasks_archive t ON t.goal_id = g.id
+               GROUP BY g.id
+               ORDER BY g.archived_at DESC, g.id DESC"""
         )
         return [dict(row) for row in cursor.fetchall()]
 
+    def restore_goal(self, goal_id: int) -> bool:
+        """Move an archived goal, its tasks and logs back. False if it isn't archived."""
+        tasks = "SELECT id FROM tasks_archive WHERE goal_id = ?"
+        moves = [
+            ("goals", "id = ?"),
+            ("tasks", "goal_id = ?"),
+            ("daily_logs", f"task_id IN ({tasks})"),
+        ]
+        with self.transaction():
+            restored = self.conn.execute(
+                "SELECT 1 FROM goals_archive WHERE id = ?", (goal_id,)
+            ).fetchone()
+            if not restored:
+                return False
+            for table, where in moves:
+                columns = ARCHIVE_COLUMNS[table]
+                self.conn.execute(
+                    f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_archive WHERE {where}",
+                    (goal_id,)
+                )
+            # Logs last: they are found through tasks_archive
+            for table, where in reversed(moves):
+                self.conn.execute(f"DELETE FROM {table}_archive WHERE {where}", (goal_id,))
+        self._emit("goal_restored", goal_id=goal_id)
+        return True
+
+    def vacuum(self, max_pages: int = None) -> Dict[str, int]:
+        """Return free pages to the filesystem; report the bytes reclaimed.
+
+        Runs PRAGMA incremental_vacuum (at most max_pages pages, default
+        all). A database created before auto_vacuum=incremental gets one
+        full VACUUM instead, which also switches it over.
+        """
+        if self._transaction_depth:
+            raise RuntimeError("vacuum() can't run inside a transaction")
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        pages_before = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        full = self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+        if full:
+            self.conn.execute("PRAGMA auto_vacuum = incremental")
+            self.conn.execute("VACUUM")
+        else:
+            # Each step frees one page, and execute() only takes the first
+            # step of a pragma that returns no rows; executescript() runs it
+            # to completion
+            self.conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages or 0)})")
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        pages_after = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        return {
+            'reclaimed_bytes': (pages_before - pages_after) * page_size,
+            'size_bytes': pages_after * page_size,
+            'free_bytes': self.conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size,
+            'full_vacuum': full,
+        }
+
     def get_all_active_tasks(self) -> List[Dict]:
         """Get all tasks that are not completed"""
         cursor = self.conn.execute(
@@ -189,4 +1009,37 @@ class Database:
             "UPDATE goals SET context = ? WHERE id = ?",
             (context, goal_id)
         )
-        self.conn.commit()
\ No newline at end of file
+        self._commit()
+        self._emit("goal_updated", goal_id=goal_id)
+
+    def get_dashboard(self, status: str = "active") -> Dict:
+        """Get goal progress and task totals for the status dashboard.
+
+        Returns {'goals': [...], 'today': n, 'overdue': n, 'active': n}, where
+        each goal dict has 'id', 'name', 'deadline', 'created_at',
+        'done_count' and 'total_count' (not the goal's context, which can be
+        a whole discovery conversation).
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        cursor = self.conn.execute(
+            """SELECT g.id, g.name, g.deadline, g.created_at,
+                      COUNT(t.id) AS total_count,
+                      COALESCE(SUM(t.status = 'done'), 0) AS done_count
+               FROM goals g
+               LEFT JOIN tasks t ON t.goal_id = g.id
+               WHERE g.status = ?
+               GROUP BY g.id
+               ORDER BY g.created_at DESC""",
+            (status,)
+        )
+        goals = [dict(row) for row in cursor.fetchall()]
+
+        row = self.conn.execute(
+            """SELECT COALESCE(SUM(due_date = ?), 0) AS today,
+                      COALESCE(SUM(due_date < ? AND status != 'done'), 0) AS overdue,
+                      COALESCE(SUM(status != 'done'), 0) AS active
+               FROM tasks""",
+            (today, today)
+        ).fetchone()
+
+        return {'goals': goals, **dict(row)}
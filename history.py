@@ -0,0 +1,98 @@
+import threading
+from typing import List, Dict, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text).
+
+    Good enough for budgeting without a count_tokens round trip per turn.
+    """
+    return len(text) // 4 + 1
+
+
+class ConversationHistory:
+    """Token-budgeted message history for long conversations.
+
+    The last keep_turns exchanges are kept verbatim. Older ones are folded
+    into a running summary by a background summarization call, so the
+    user never waits on it; until that call finishes the turns stay
+    verbatim. window() trims the oldest verbatim turns if the request
+    would otherwise exceed budget_tokens.
+    """
+
+    def __init__(self, agent, keep_turns: int = 6, budget_tokens: int = 16000):
+        self.agent = agent
+        self.keep_turns = keep_turns
+        self.budget_tokens = budget_tokens
+        self.summary = ""
+        self.turns = []  # [(user_message, assistant_message), ...] not yet summarized
+        self._fold_thread = None
+        self._fold_count = 0
+        self._fold_result = None
+
+    def add_turn(self, user_message: str, assistant_message: str):
+        """Record a completed exchange and start folding old turns if needed."""
+        self.turns.append((user_message, assistant_message))
+        self._collect_fold()
+        if self._fold_thread is None and len(self.turns) > self.keep_turns:
+            self._start_fold(len(self.turns) - self.keep_turns)
+
+    def window(self, reserved_tokens: int = 0) -> Tuple[list, List[Dict]]:
+        """What to send this turn: (summary system blocks, messages).
+
+        reserved_tokens is what the rest of the request (system prompt, new
+        user message) will use. Newest turns are kept first, and the most
+        recent turn is always included.
+        """
+        self._collect_fold()
+        available = self.budget_tokens - reserved_tokens - estimate_tokens(self.summary)
+
+        kept = []
+        for user_message, assistant_message in reversed(self.turns):
+            cost = estimate_tokens(user_message) + estimate_tokens(assistant_message)
+            if kept and cost > available:
+                break
+            kept.append((user_message, assistant_message))
+            available -= cost
+
+        messages = []
+        for user_message, assistant_message in reversed(kept):
+            messages.append({"role": "user", "content": user_message})
+            messages.append({"role": "assistant", "content": assistant_message})
+
+        summary_blocks = []
+        if self.summary:
+            summary_blocks.append({
+                "type": "text",
+                "text": f"\nEARLIER IN THIS CONVERSATION:\n{self.summary}\n",
+            })
+        return summary_blocks, messages
+
+    def _start_fold(self, count: int):
+        turns = self.turns[:count]
+        summary = self.summary
+        messages = []
+        for user_message, assistant_message in turns:
+            messages.append({"role": "user", "content": user_message})
+            messages.append({"role": "assistant", "content": assistant_message})
+
+        def run():
+            try:
+                self._fold_result = self.agent.summarize_conversation(summary, messages)
+            except Exception:
+                self._fold_result = None  # keep the turns verbatim; retry next turn
+
+        self._fold_count = count
+        self._fold_result = None
+        # Daemon thread so quitting mid-summary doesn't wait on the request
+        self._fold_thread = threading.Thread(target=run, daemon=True)
+        self._fold_thread.start()
+
+    def _collect_fold(self):
+        """Apply a finished background summary, if any."""
+        if self._fold_thread is None or self._fold_thread.is_alive():
+            return
+        if self._fold_result is not None:
+            self.summary = self._fold_result
+            del self.turns[:self._fold_count]
+        self._fold_thread = None
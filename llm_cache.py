@@ -0,0 +1,101 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """On-disk cache of LLM response text, keyed by a hash of the request.
+
+    The key covers everything that shapes the response (model, system
+    prompt, messages, max_tokens, ...), so a changed prompt is simply a
+    different entry. Each entry carries its own expiry, and when the cache
+    grows past max_bytes the least recently used entries are evicted.
+    Stored in ~/.compass/llm_cache.db by default.
+    """
+
+    def __init__(self, path=None, max_bytes: int = 20 * 1024 * 1024):
+        if path is None:
+            path = Path.home() / ".compass" / "llm_cache.db"
+            path.parent.mkdir(exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Shared by the async and background-summary threads
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = wal")
+        self.conn.execute("PRAGMA synchronous = normal")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def key(request: Dict) -> str:
+        """Content address of a messages.create request."""
+        canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, request: Dict) -> Optional[str]:
+        """Cached response for request, or None if missing or expired."""
+        key = self.key(request)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, request: Dict, response: str, ttl: float):
+        """Store response for ttl seconds, then evict down to max_bytes."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.key(request), response, len(response.encode()), now + ttl, now)
+            )
+            self.conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            # Keep the most recently used entries whose sizes fit in max_bytes
+            self.conn.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS total
+                        FROM responses
+                    ) WHERE total > ?
+                )
+            """, (self.max_bytes,))
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counts for this process, plus what's on disk."""
+        with self._lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
@@ -1,13 +1,46 @@
 import click
+import csv
+import itertools
 import json
+import math
+import os
+import sys
+from pathlib import Path
 from database import Database
-from agent import Agent
+from analytics import Analytics
+from agent import Agent, AsyncAgent, InteractivePromptBuilder, TaskSpeculator
+from history import ConversationHistory, estimate_tokens
+from llm_cache import ResponseCache
 from user_profile import UserProfile
-from datetime import datetime
+from tracing import tracer
+from datetime import datetime, timedelta
+from typing import Optional
 
-db = Database()
-agent = Agent()
-profile = UserProfile()
+class _Lazy:
+    """Stand-in that builds the real object on first attribute access.
+
+    Keeps one-shot commands like 'compass done 12' from opening anything
+    they don't use (and keeps 'compass --help' from creating agent.db).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._obj = None
+
+    def __getattr__(self, name):
+        if self._obj is None:
+            self._obj = self._factory()
+        return getattr(self._obj, name)
+
+
+# instrument() is a no-op unless tracing is on (compass --trace)
+db = _Lazy(lambda: tracer.instrument(Database(), "db"))
+agent = _Lazy(lambda: tracer.instrument(Agent(response_cache=ResponseCache()), "agent"))
+async_agent = _Lazy(lambda: AsyncAgent(agent))
+profile = _Lazy(lambda: tracer.instrument(UserProfile(), "profile"))
+analytics = _Lazy(lambda: tracer.instrument(Analytics(db), "analytics"))
+
+LLM_TIMEOUT_SECONDS = 120
 
 
 # ======================================================================
@@ -15,9 +48,13 @@ profile = UserProfile()
 # ======================================================================
 
 @click.group(invoke_without_command=True)
+@click.option('--trace', is_flag=True,
+              help="Record timing spans to ~/.compass/trace.jsonl (see 'compass perf')")
 @click.pass_context
-def cli(ctx):
+def cli(ctx, trace):
     """Compass — your AI accountability agent."""
+    if trace:
+        tracer.enable()
     if ctx.invoked_subcommand is None:
         interactive_mode()
 
@@ -28,10 +65,8 @@ def cli(ctx):
 
 def show_status_snapshot():
     """Print a quick dashboard of current state."""
-    goals = db.get_all_goals()
-    today_tasks = db.get_todays_tasks()
-    overdue_tasks = db.get_overdue_tasks()
-    active_tasks = db.get_all_active_tasks()
+    dashboard = db.get_dashboard()
+    goals = dashboard['goals']
 
     if not goals:
         click.echo("  No goals yet. Type /new to create one.\n")
@@ -39,24 +74,135 @@ def show_status_snapshot():
 
     click.echo("  Goals:")
     for g in goals:
-        goal_tasks = db.get_tasks_for_goal(g['id'])
-        done_count = sum(1 for t in goal_tasks if t['status'] == 'done')
-        total = len(goal_tasks)
         deadline_str = f" — due {g['deadline']}" if g.get('deadline') else ""
-        click.echo(f"    {g['name']} ({done_count}/{total} tasks){deadline_str}")
+        click.echo(f"    {g['name']} ({g['done_count']}/{g['total_count']} tasks){deadline_str}")
 
     lines = []
-    if today_tasks:
-        lines.append(f"{len(today_tasks)} due today")
-    if overdue_tasks:
-        lines.append(f"{len(overdue_tasks)} overdue")
-    if active_tasks:
-        lines.append(f"{len(active_tasks)} active")
+    if dashboard['today']:
+        lines.append(f"{dashboard['today']} due today")
+    if dashboard['overdue']:
+        lines.append(f"{dashboard['overdue']} overdue")
+    if dashboard['active']:
+        lines.append(f"{dashboard['active']} active")
 
     if lines:
         click.echo(f"\n  Tasks: {' | '.join(lines)}")
 
 
+def echo_stream(chunks) -> str:
+    """Print a streamed agent reply as it arrives; return the full text."""
+    click.echo("\n  ", nl=False)
+    parts = []
+    for chunk in chunks:
+        click.echo(chunk, nl=False)
+        parts.append(chunk)
+    click.echo("\n")
+    return "".join(parts)
+
+
+def is_api_error(error: Exception) -> bool:
+    """An anthropic.APIError, or a TimeoutError from the scheduler's deadline.
+
+    Checked through sys.modules so offline commands never import the SDK;
+    if the error came from it, it is loaded.
+    """
+    anthropic = sys.modules.get("anthropic")
+    return isinstance(error, TimeoutError) or (
+        anthropic is not None and isinstance(error, anthropic.APIError)
+    )
+
+
+def api_error_reason(error: Exception) -> str:
+    """Short description of an API error for the user, e.g. 'OverloadedError 529'."""
+    status = getattr(error, 'status_code', None)
+    return f"{type(error).__name__}{f' {status}' if status else ''}"
+
+
+def echo_reply(message_history: list, chunks) -> Optional[str]:
+    """echo_stream for a conversation turn; an API failure doesn't end the session.
+
+    When the scheduler has given up (or the error isn't retryable), print
+    a short note, drop the unanswered user message from message_history
+    and return None.
+    """
+    try:
+        return echo_stream(chunks)
+    except Exception as error:
+        if not is_api_error(error):
+            raise
+        if message_history and message_history[-1]['role'] == 'user':
+            message_history.pop()
+        click.echo(f"\n  Couldn't get a reply ({api_error_reason(error)}). Try again in a moment.\n")
+        return None
+
+
+def echo_task(number: int, task: dict):
+    line = f"  {number}. {task['description']}"
+    if task.get('estimated_hours'):
+        line += f" ({task['estimated_hours']}h)"
+    if task.get('due_date'):
+        line += f" — due {task['due_date']}"
+    click.echo(line)
+
+
+def echo_lines(lines) -> bool:
+    """Echo lines as they are produced, so long listings start printing at once.
+
+    Returns False if the reader went away (e.g. piped to head); the
+    generator is then closed, so no further pages are fetched.
+    """
+    try:
+        for line in lines:
+            click.echo(line)
+    except BrokenPipeError:
+        lines.close()
+        # Python flushes stdout again at exit; send that to /dev/null instead
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return False
+    return True
+
+
+def log_time(task_id: int, hours: float, notes: str = ""):
+    """Log hours on a task and show its running total. Used by log and /log."""
+    if not (math.isfinite(hours) and hours > 0):
+        click.echo(f"  Hours must be a positive number, not {hours:g}.")
+        return
+    if analytics.task_hours(task_id) is None:
+        click.echo(f"  No task with ID {task_id}.")
+        return
+    db.log_progress(task_id, hours, notes)
+    task = analytics.task_hours(task_id)
+    line = f"  Logged {hours:g}h on \"{task['description']}\". Total: {task['logged_hours']:g}h"
+    if task['estimated_hours']:
+        line += f" of {task['estimated_hours']:g}h estimated"
+    click.echo(line + ".")
+
+
+def task_printer():
+    """on_task callback that prints generated tasks as they stream in."""
+    numbers = itertools.count(1)
+    return lambda task: echo_task(next(numbers), task)
+
+
+SEARCH_LABELS = {'task': "task", 'goal': "goal", 'context': "goal chat", 'log': "log"}
+
+
+def echo_search_results(query: str, limit: int = 20):
+    """Print db.search() results, matches in bold."""
+    results = db.search(query, limit=limit, highlight=("\x1b[1m", "\x1b[22m"))
+    if not results:
+        click.echo(f"\n  No matches for \"{query}\".\n")
+        return
+    click.echo()
+    for r in results:
+        label = f"{SEARCH_LABELS[r['kind']]} {r['id']}"
+        click.echo(f"  [{label}] {r['title']}")
+        if r['kind'] != 'task':
+            snippet = " ".join(r['snippet'].split())
+            click.echo(f"      {snippet}")
+    click.echo()
+
+
 def handle_inline_command(command: str) -> bool:
     """Handle /commands inside interactive mode. Returns True if handled."""
 
@@ -69,11 +215,14 @@ def handle_inline_command(command: str) -> bool:
         click.echo("    /status     — refresh dashboard")
         click.echo("    /goals      — list all goals")
         click.echo("    /tasks [id] — list tasks (for a goal, or all active)")
+        click.echo("    /search <words> — search tasks, goals, conversations, notes")
         click.echo("    /done <id>  — mark a task complete")
         click.echo("    /undone <id> — mark a task incomplete")
+        click.echo("    /log <id> <hours> [notes] — log time on a task")
         click.echo("    /new        — create a new goal")
         click.echo("    /checkin    — start daily check-in")
         click.echo("    /profile    — view your profile")
+        click.echo("    /usage      — token usage, cache hits and API retries")
         click.echo("    /quit       — exit compass")
         click.echo()
         return True
@@ -85,15 +234,13 @@ def handle_inline_command(command: str) -> bool:
         return True
 
     elif cmd == "/goals":
-        goals = db.get_all_goals()
+        goals = db.get_dashboard()['goals']
         if not goals:
             click.echo("\n  No active goals.\n")
             return True
         click.echo()
         for g in goals:
-            goal_tasks = db.get_tasks_for_goal(g['id'])
-            done_count = sum(1 for t in goal_tasks if t['status'] == 'done')
-            click.echo(f"  [{g['id']}] {g['name']} ({done_count}/{len(goal_tasks)} tasks)")
+            click.echo(f"  [{g['id']}] {g['name']} ({g['done_count']}/{g['total_count']} tasks)")
             if g.get('deadline'):
                 click.echo(f"      Deadline: {g['deadline']}")
         click.echo()
@@ -103,9 +250,10 @@ def handle_inline_command(command: str) -> bool:
         if arg:
             try:
                 goal_id = int(arg)
-                tasks = db.get_tasks_for_goal(goal_id)
+                tasks = db.iter_tasks(goal_id=goal_id)
+                first = next(tasks, None)
                 goal = db.get_goal(goal_id)
-                if not tasks:
+                if first is None:
                     click.echo(f"\n  No tasks for goal {goal_id}.\n")
                     return True
                 click.echo(f"\n  Tasks for: {goal['name']}\n")
@@ -113,20 +261,26 @@ def handle_inline_command(command: str) -> bool:
                 click.echo(f"\n  Invalid goal ID: {arg}\n")
                 return True
         else:
-            tasks = db.get_all_active_tasks()
-            if not tasks:
+            tasks = db.iter_tasks(active_only=True)
+            first = next(tasks, None)
+            if first is None:
                 click.echo("\n  No active tasks.\n")
                 return True
             click.echo("\n  Active tasks:\n")
 
-        for t in tasks:
-            icon = "  done" if t['status'] == 'done' else ""
-            overdue = ""
-            if t.get('due_date') and t['due_date'] < datetime.now().strftime("%Y-%m-%d") and t['status'] != 'done':
-                overdue = " (OVERDUE)"
-            due = f" — due {t['due_date']}" if t.get('due_date') else ""
-            click.echo(f"  [{t['id']}] {t['description']}{due}{overdue}{icon}")
-        click.echo()
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        def lines():
+            for t in itertools.chain([first], tasks):
+                icon = "  done" if t['status'] == 'done' else ""
+                overdue = ""
+                if t.get('due_date') and t['due_date'] < today and t['status'] != 'done':
+                    overdue = " (OVERDUE)"
+                due = f" — due {t['due_date']}" if t.get('due_date') else ""
+                yield f"  [{t['id']}] {t['description']}{due}{overdue}{icon}"
+
+        if echo_lines(lines()):
+            click.echo()
         return True
 
     elif cmd == "/done":
@@ -141,6 +295,18 @@ def handle_inline_command(command: str) -> bool:
             click.echo(f"\n  Invalid task ID: {arg}\n")
         return True
 
+    elif cmd == "/log":
+        args = arg.split(maxsplit=2)
+        try:
+            task_id, hours = int(args[0]), float(args[1])
+        except (IndexError, ValueError):
+            click.echo("\n  Usage: /log <task_id> <hours> [notes]\n")
+            return True
+        click.echo()
+        log_time(task_id, hours, args[2] if len(args) > 2 else "")
+        click.echo()
+        return True
+
     elif cmd == "/undone":
         if not arg:
             click.echo("\n  Usage: /undone <task_id>\n")
@@ -163,6 +329,13 @@ def handle_inline_command(command: str) -> bool:
         run_checkin()
         return True
 
+    elif cmd == "/search":
+        if not arg:
+            click.echo("\n  Usage: /search <words>\n")
+            return True
+        echo_search_results(arg)
+        return True
+
     elif cmd == "/profile":
         if not profile.exists():
             click.echo("\n  No profile yet. I'll learn about you as we talk.\n")
@@ -171,6 +344,32 @@ def handle_inline_command(command: str) -> bool:
         click.echo(f"\n{summary}\n")
         return True
 
+    elif cmd == "/usage":
+        cache = agent.response_cache.stats()
+        cache_line = (f"  Response cache: {cache['hits']} hits, {cache['misses']} misses "
+                      f"({cache['entries']} entries, {cache['bytes'] // 1024} KB)")
+        sched = agent.scheduler.stats()
+        cache_line += (f"\n  API calls: {sched['calls']} ({sched['retries']} retries, "
+                       f"{sched['failures']} failed) | wait avg {sched['avg_wait']:.2f}s, "
+                       f"max {sched['max_wait']:.2f}s | max queue {sched['max_queue_depth']}")
+        if not agent.usage_log:
+            click.echo("\n  No conversation turns yet.")
+            click.echo(f"{cache_line}\n")
+            return True
+        last = agent.usage_log[-1]
+        totals = agent.usage_totals()
+        click.echo("\n  Last turn:")
+        click.echo(f"    input {last['input_tokens']} | output {last['output_tokens']} | "
+                   f"cache read {last['cache_read_input_tokens']} | "
+                   f"cache write {last['cache_creation_input_tokens']}")
+        click.echo(f"  Session ({totals['turns']} turns):")
+        click.echo(f"    input {totals['input_tokens']} | output {totals['output_tokens']} | "
+                   f"cache read {totals['cache_read_input_tokens']} | "
+                   f"cache write {totals['cache_creation_input_tokens']}")
+        click.echo(cache_line)
+        click.echo()
+        return True
+
     elif cmd == "/quit":
         return False  # Signal to exit
 
@@ -194,17 +393,17 @@ def interactive_mode():
 
     click.echo(f"\n  Talk to me, or type /help for commands.\n")
 
-    # Build system prompt with full context
-    goals = db.get_all_goals()
-    active_tasks = db.get_all_active_tasks()
-    overdue_tasks = db.get_overdue_tasks()
-    today_tasks = db.get_todays_tasks()
-
-    system_prompt = agent.build_interactive_system_prompt(
-        user_profile, goals, active_tasks, overdue_tasks, today_tasks
-    )
+    # System prompt with full context, kept current as tasks and goals change
+    prompt_builder = tracer.instrument(InteractivePromptBuilder(agent, {
+        'profile': profile.load,
+        'goals': db.get_all_goals,
+        'overdue': db.get_overdue_tasks,
+        'today': db.get_todays_tasks,
+        'active': db.get_all_active_tasks,
+    }), "prompt")
+    db.subscribe(prompt_builder.on_change)
 
-    message_history = []
+    history = ConversationHistory(agent)
 
     while True:
         try:
@@ -225,13 +424,19 @@ def interactive_mode():
             if result is False:  # /quit
                 click.echo("\n  See you.\n")
                 break
+            if stripped.lower().startswith('/new'):
+                prompt_builder.invalidate('profile')  # the goal flow can learn profile facts
             continue
 
         # Send to agent for conversation
-        response = agent.conversation_turn(message_history, stripped, system_prompt=system_prompt)
-        message_history.append({"role": "assistant", "content": response})
-
-        click.echo(f"\n  {response}\n")
+        system_blocks = prompt_builder.system_blocks()
+        reserved = sum(estimate_tokens(b['text']) for b in system_blocks) + estimate_tokens(stripped)
+        summary_blocks, messages = history.window(reserved)
+        response = echo_reply(messages, agent.stream_conversation_turn(
+            messages, stripped, system_prompt=system_blocks + summary_blocks
+        ))
+        if response is not None:
+            history.add_turn(stripped, response)
 
 
 # ======================================================================
@@ -270,9 +475,11 @@ def status():
 @click.option('--deadline', default=None, help="Format: YYYY-MM-DD")
 @click.option('--category', '-c', default="general",
               help="Goal category (career, health, finance, learning, general)")
-def new_goal(name, description, deadline, category):
+@click.option('--speculate', is_flag=True,
+              help="Generate tasks in the background during the conversation")
+def new_goal(name, description, deadline, category, speculate):
     """Create a new goal with conversational task breakdown."""
-    run_new_goal_flow(name, description, deadline, category)
+    run_new_goal_flow(name, description, deadline, category, speculate)
 
 
 # Keep old command name as alias
@@ -281,13 +488,26 @@ def new_goal(name, description, deadline, category):
 @click.option('--description', '-d', default="")
 @click.option('--deadline', default=None, help="Format: YYYY-MM-DD")
 @click.option('--category', '-c', default="general")
-def add_goal(name, description, deadline, category):
+@click.option('--speculate', is_flag=True,
+              help="Generate tasks in the background during the conversation")
+def add_goal(name, description, deadline, category, speculate):
     """Create a new goal (alias for 'new')."""
-    run_new_goal_flow(name, description, deadline, category)
+    run_new_goal_flow(name, description, deadline, category, speculate)
+
+
+def conversation_text(message_history: list) -> str:
+    """Flatten a message history into 'role: content' lines."""
+    return "\n".join([f"{m['role']}: {m['content']}" for m in message_history])
 
 
-def run_new_goal_flow(name=None, description="", deadline=None, category="general"):
-    """Conversational goal creation flow. Used by both /new command and inline."""
+def run_new_goal_flow(name=None, description="", deadline=None, category="general",
+                      speculate=False):
+    """Conversational goal creation flow. Used by both /new command and inline.
+
+    With speculate, tasks (and profile updates) are generated in the
+    background after every discovery turn, so they can be shown the moment
+    the user says 'go'.
+    """
 
     user_profile = profile.load()
 
@@ -302,11 +522,21 @@ def run_new_goal_flow(name=None, description="", deadline=None, category="genera
             setup_profile_interactive()
             user_profile = profile.load()
 
-    goal_id = db.add_goal(name, description, deadline, category)
-    click.echo(f"\n  Created: {name} (ID: {goal_id})")
+    # Nothing is written until the flow ends, so the goal, its context and
+    # its tasks land in a single transaction (or not at all).
+    goal_context = None
+
+    def save_goal(tasks=None):
+        with db.transaction():
+            goal_id = db.add_goal(name, description, deadline, category, goal_context)
+            if tasks:
+                db.add_tasks_bulk(goal_id, tasks)
+        click.echo(f"\n  Created: {name} (ID: {goal_id})")
+        return goal_id
 
     # Start discovery conversation
     if not click.confirm("\n  Let me ask a few questions to create the right tasks. Ready?", default=True):
+        goal_id = save_goal()
         click.echo(f"  Goal saved. Add tasks later with: compass add-task {goal_id} <description>\n")
         return
 
@@ -320,65 +550,125 @@ def run_new_goal_flow(name=None, description="", deadline=None, category="genera
             click.echo()
 
     # Discovery conversation
-    greeting = agent.goal_discovery_greeting(name, user_profile, category)
+    try:
+        greeting = agent.goal_discovery_greeting(name, user_profile, category)
+    except Exception as e:
+        if not is_api_error(e):
+            raise
+        goal_id = save_goal()
+        click.echo(f"  Couldn't start the conversation ({api_error_reason(e)}).")
+        click.echo(f"  Goal saved. Add tasks later with: compass add-task {goal_id} <description>\n")
+        return
     click.echo(f"  {greeting}\n")
 
     message_history = [{"role": "assistant", "content": greeting}]
 
-    click.echo("  (Type 'go' when ready to generate tasks)\n")
+    speculator = TaskSpeculator(agent) if speculate else None
 
-    for _ in range(8):
-        user_input = click.prompt("  >", prompt_suffix=" ")
+    def speculate_tasks():
+        if speculator:
+            speculator.start(message_history, category, name, description,
+                             conversation_text(message_history), user_profile, deadline)
 
-        if user_input.strip().lower() in ['go', 'done', 'generate']:
-            break
+    def generate_tasks(conversation_summary):
+        """(profile_updates, tasks, streamed) for the finished conversation."""
+        # Profile extraction and task generation are independent: run them together
+        click.echo("  Generating tasks...\n")
+        speculated = speculator.get(conversation_summary) if speculator else None
+        if speculated:
+            try:
+                profile_updates, tasks = speculated.result(timeout=LLM_TIMEOUT_SECONDS)
+                return profile_updates, tasks, False
+            except TimeoutError:
+                click.echo("  That took too long.")
+                return {}, [], False
+            except Exception:
+                pass  # the background run failed: generate them afresh below
+        try:
+            profile_updates, tasks = async_agent.run(
+                # Tasks are what matter; the profile just doesn't learn anything
+                async_agent.optional(
+                    async_agent.extract_profile_updates(message_history, category), {}
+                ),
+                async_agent.generate_tasks_from_context(
+                    name, description, conversation_summary, user_profile, deadline,
+                    on_task=task_printer()
+                ),
+                timeout=LLM_TIMEOUT_SECONDS,
+            )
+            return profile_updates, tasks, True
+        # asyncio's and concurrent.futures' TimeoutError are the builtin one
+        except TimeoutError:
+            click.echo("  That took too long.")
+        except Exception as e:
+            # Fall through and save the goal and its conversation anyway
+            click.echo(f"  Something went wrong generating tasks ({type(e).__name__}: {e}).")
+        return {}, [], False
 
-        response = agent.conversation_turn(message_history, user_input)
-        message_history.append({"role": "assistant", "content": response})
-        click.echo(f"\n  {response}\n")
+    click.echo("  (Type 'go' when ready to generate tasks)\n")
+    speculate_tasks()
 
-    # Extract and save learnings to profile
-    profile_updates = agent.extract_profile_updates(message_history, category)
+    try:
+        discovery_error = None
+        try:
+            for _ in range(8):
+                user_input = click.prompt("  >", prompt_suffix=" ")
+
+                if user_input.strip().lower() in ['go', 'done', 'generate']:
+                    break
+
+                if speculator:
+                    speculator.cancel()  # the conversation is moving on
+                response = agent.conversation_turn(message_history, user_input)
+                message_history.append({"role": "assistant", "content": response})
+                click.echo(f"\n  {response}\n")
+                speculate_tasks()
+        except Exception as e:
+            if not is_api_error(e):
+                raise
+            # Keep what was said so far; the goal is saved with it below
+            discovery_error = e
+
+        # Goal context, saved along with the goal
+        conversation_summary = conversation_text(message_history)
+        goal_context = json.dumps({'conversation': conversation_summary})
+
+        if discovery_error:
+            click.echo(f"\n  Lost the conversation ({api_error_reason(discovery_error)}).")
+            profile_updates, tasks, streamed = {}, [], False
+        else:
+            profile_updates, tasks, streamed = generate_tasks(conversation_summary)
+    finally:
+        if speculator:
+            speculator.close()
+
+    # Show tasks (unless they were printed as they streamed in)
+    if not streamed:
+        for i, task in enumerate(tasks, 1):
+            echo_task(i, task)
+    if tasks:
+        click.echo()
+
+    # Save learnings to profile
     if profile_updates:
         profile.update_category(category, profile_updates)
         click.echo("  Updated your profile with what I learned.\n")
 
-    # Store goal context
-    conversation_summary = "\n".join([f"{m['role']}: {m['content']}" for m in message_history])
-    db.update_goal_context(goal_id, json.dumps({'conversation': conversation_summary}))
-
-    # Generate tasks
-    click.echo("  Generating tasks...\n")
-    tasks = agent.generate_tasks_from_context(
-        name, description, conversation_summary, user_profile, deadline
-    )
-
     if not tasks:
-        click.echo("  Couldn't generate tasks. Add them manually with /tasks.\n")
+        goal_id = save_goal()
+        click.echo(f"  Couldn't generate tasks. Add them with: compass add-task {goal_id} <desc>\n")
         return
 
-    # Show tasks
-    for i, task in enumerate(tasks, 1):
-        line = f"  {i}. {task['description']}"
-        if task.get('estimated_hours'):
-            line += f" ({task['estimated_hours']}h)"
-        if task.get('due_date'):
-            line += f" — due {task['due_date']}"
-        click.echo(line)
-    click.echo()
-
     # Confirm loop
     while True:
         if click.confirm("  Add these tasks?", default=True):
-            for task in tasks:
-                db.add_task(goal_id, task['description'],
-                           task.get('estimated_hours'), task.get('due_date'))
-            click.echo(f"\n  Added {len(tasks)} tasks to \"{name}\".\n")
+            save_goal(tasks)
+            click.echo(f"  Added {len(tasks)} tasks to \"{name}\".\n")
             break
         else:
             click.echo("\n  1. Regenerate (tell me what to change)")
             click.echo("  2. Save goal without tasks")
-            click.echo("  3. Delete goal")
+            click.echo("  3. Discard goal")
             click.echo("  4. Talk it through")
 
             choice = click.prompt("\n  Choice", type=click.Choice(['1', '2', '3', '4']))
@@ -387,28 +677,26 @@ def run_new_goal_flow(name=None, description="", deadline=None, category="genera
                 feedback = click.prompt("  What should be different?", type=str)
                 context_with_feedback = conversation_summary + f"\n\nUser feedback on tasks: {feedback}"
                 click.echo("\n  Regenerating...\n")
-                tasks = agent.generate_tasks_from_context(
-                    name, description, context_with_feedback, user_profile, deadline
-                )
-                for i, task in enumerate(tasks, 1):
-                    line = f"  {i}. {task['description']}"
-                    if task.get('estimated_hours'):
-                        line += f" ({task['estimated_hours']}h)"
-                    if task.get('due_date'):
-                        line += f" — due {task['due_date']}"
-                    click.echo(line)
+                try:
+                    tasks = agent.generate_tasks_from_context(
+                        name, description, context_with_feedback, user_profile, deadline,
+                        on_task=task_printer()
+                    )
+                except Exception as e:
+                    click.echo(f"  Couldn't regenerate ({type(e).__name__}: {e}). Keeping the tasks above.")
                 click.echo()
 
             elif choice == '2':
-                click.echo(f"\n  Goal saved. Add tasks with: compass add-task {goal_id} <desc>\n")
+                goal_id = save_goal()
+                click.echo(f"  Goal saved. Add tasks with: compass add-task {goal_id} <desc>\n")
                 break
 
             elif choice == '3':
-                db.delete_goal(goal_id)
-                click.echo("\n  Goal deleted.\n")
+                click.echo("\n  Goal discarded.\n")
                 break
 
             elif choice == '4':
+                save_goal()
                 click.echo("\n  What's on your mind?\n")
                 chat_history = []
                 while True:
@@ -449,19 +737,19 @@ def checkin():
 def run_checkin():
     """Check-in flow. Used by both command and /checkin."""
 
-    goals = db.get_all_goals()
-    yesterday_tasks = db.get_yesterdays_completed_tasks()
-    today_tasks = db.get_todays_tasks()
-    overdue_tasks = db.get_overdue_tasks()
+    context = db.get_checkin_context()
 
-    context = {
-        'goals': goals,
-        'yesterday_tasks': yesterday_tasks,
-        'today_tasks': today_tasks,
-        'overdue_tasks': overdue_tasks
-    }
-
-    greeting = agent.daily_checkin_greeting(context)
+    # Pre-generated overnight by batch-checkin, if it ran
+    greeting = db.take_checkin_greeting(datetime.now().strftime("%Y-%m-%d"))
+    if greeting is None:
+        try:
+            greeting = agent.daily_checkin_greeting(context)
+        except Exception as e:
+            if not is_api_error(e):
+                raise
+            click.echo(f"\n  Couldn't start the check-in ({api_error_reason(e)}). "
+                       f"Try again in a moment.\n")
+            return
     click.echo(f"\n  {greeting}\n")
 
     message_history = [{"role": "assistant", "content": greeting}]
@@ -479,9 +767,117 @@ def run_checkin():
             click.echo("\n  Check-in complete.\n")
             break
 
-        response = agent.conversation_turn(message_history, user_input, context=context)
-        message_history.append({"role": "assistant", "content": response})
-        click.echo(f"\n  {response}\n")
+        response = echo_reply(message_history, agent.stream_conversation_turn(
+            message_history, user_input, context=context
+        ))
+        if response is not None:
+            message_history.append({"role": "assistant", "content": response})
+
+
+@cli.command()
+@click.argument('query', nargs=-1, required=True)
+@click.option('--limit', default=20, show_default=True)
+def search(query, limit):
+    """Search tasks, goals, goal conversations and log notes."""
+    echo_search_results(" ".join(query), limit)
+
+
+@cli.command()
+@click.option('--sessions', default=20, show_default=True, help="How many recent sessions to include")
+@click.option('--name', 'prefix', default="", help="Only operations starting with this (e.g. db., llm.)")
+def perf(sessions, prefix):
+    """Latency percentiles per operation, from 'compass --trace' sessions."""
+    spans = [span for span in tracer.load(sessions) if span["name"].startswith(prefix)]
+    if not spans:
+        click.echo("  No traces yet. Run compass with --trace (or COMPASS_TRACE=1) first.")
+        return
+
+    click.echo(f"\n  {'operation':<40} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+               f" {'ttfb p50':>9} {'tokens in/out':>14}")
+    for row in tracer.report(spans):
+        ttfb = f"{row['ttfb_p50']:.1f}" if 'ttfb_p50' in row else ""
+        tokens = (f"{row['input_tokens']:.0f}/{row['output_tokens']:.0f}"
+                  if 'input_tokens' in row else "")
+        click.echo(f"  {row['name']:<40} {row['count']:>6} {row['p50']:>9.1f} {row['p95']:>9.1f}"
+                   f" {row['p99']:>9.1f} {row['max']:>9.1f} {ttfb:>9} {tokens:>14}")
+    click.echo(f"\n  Times in ms, across {len({span['session'] for span in spans})} sessions.\n")
+
+
+BATCH_DIR = Path.home() / ".compass" / "batches"
+
+
+@cli.command('batch-checkin')
+@click.argument('db_paths', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option('--collect', 'batch_id', help="Collect an earlier batch instead of submitting one")
+@click.option('--no-wait', is_flag=True, help="Submit and exit; run --collect later")
+@click.option('--poll-interval', default=60.0, show_default=True, help="Seconds between polls")
+@click.option('--timeout', default=24 * 3600.0, show_default=True,
+              help="Seconds to wait for the batch")
+@click.option('--for-date', help="Day the greetings are for, YYYY-MM-DD (default: tomorrow)")
+def batch_checkin(db_paths, batch_id, no_wait, poll_interval, timeout, for_date):
+    """Pre-generate check-in greetings for many databases as one batch.
+
+    Submits one greeting request per database through the Message Batches
+    API, waits for it to finish, and stores each greeting in its database
+    so the check-in on --for-date (tomorrow, for a nightly job) opens
+    instantly.
+    """
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+
+    if batch_id is None:
+        if not db_paths:
+            click.echo("  Give one or more agent.db paths, or --collect BATCH_ID.")
+            return
+        if for_date is None:
+            for_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        try:
+            datetime.strptime(for_date, "%Y-%m-%d")
+        except ValueError:
+            click.echo(f"  --for-date must be YYYY-MM-DD, not {for_date!r}.")
+            return
+        requests = {}
+        databases = {}
+        for i, path in enumerate(db_paths):
+            custom_id = f"checkin-{i}"
+            requests[custom_id] = agent.checkin_greeting_request(
+                Database(path).get_checkin_context(for_date), for_date)
+            databases[custom_id] = os.path.abspath(path)
+
+        batch_id = agent.submit_batch(requests)
+        manifest = {'date': for_date, 'databases': databases}
+        (BATCH_DIR / f"{batch_id}.json").write_text(json.dumps(manifest, indent=2))
+        click.echo(f"  Submitted {len(requests)} check-ins as batch {batch_id}.")
+        if no_wait:
+            click.echo(f"  Collect with: compass batch-checkin --collect {batch_id}")
+            return
+
+    manifest_path = BATCH_DIR / f"{batch_id}.json"
+    if not manifest_path.exists():
+        click.echo(f"  No record of batch {batch_id} in {BATCH_DIR}.")
+        return
+    manifest = json.loads(manifest_path.read_text())
+
+    def on_poll(batch):
+        counts = batch.request_counts
+        click.echo(f"  Waiting... {counts.processing} processing, "
+                   f"{counts.succeeded} done, {counts.errored} errored")
+
+    try:
+        agent.wait_for_batch(batch_id, poll_interval=poll_interval,
+                             timeout=timeout, on_poll=on_poll)
+    except TimeoutError as e:
+        click.echo(f"  {e}. Collect later with: compass batch-checkin --collect {batch_id}")
+        return
+
+    results = agent.batch_results(batch_id)
+    for custom_id, path in manifest['databases'].items():
+        if custom_id in results:
+            Database(path).save_checkin_greeting(manifest['date'], results[custom_id], batch_id)
+        else:
+            click.echo(f"  No greeting for {path} (request failed or expired).")
+    manifest_path.unlink()
+    click.echo(f"  Stored {len(results)} of {len(manifest['databases'])} greetings "
+               f"for {manifest['date']}.")
 
 
 # ======================================================================
@@ -499,18 +895,114 @@ def add_task(goal_id, description, hours, due):
     click.echo(f"  Added: {description} (ID: {task_id})")
 
 
+def parse_task_record(record) -> dict:
+    """Validate one imported record into a task dict; ValueError says what's wrong."""
+    if not isinstance(record, dict):
+        raise ValueError("expected an object with a description")
+    description = record.get('description')
+    if not isinstance(description, str) or not description.strip():
+        raise ValueError("missing description")
+
+    hours = record.get('estimated_hours')
+    if hours in (None, ''):
+        hours = None
+    else:
+        try:
+            hours = float(hours)
+        except (TypeError, ValueError):
+            raise ValueError(f"estimated_hours {hours!r} is not a number")
+        if not math.isfinite(hours) or hours < 0:
+            raise ValueError(f"estimated_hours {hours!r} is out of range")
+
+    due_date = record.get('due_date') or None
+    if due_date is not None:
+        try:
+            datetime.strptime(str(due_date), "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"due_date {due_date!r} is not YYYY-MM-DD")
+
+    return {'description': description.strip(), 'estimated_hours': hours, 'due_date': due_date}
+
+
+def read_task_file(path: str, fmt: str, on_error=None):
+    """Yield task dicts from a CSV (with a header row) or JSONL file.
+
+    Invalid records are skipped; on_error(line_number, message) is called
+    for each one.
+    """
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            records = ((reader.line_num, record) for record in reader)
+        else:
+            records = ((number, line) for number, line in enumerate(f, 1) if line.strip())
+        for line_number, record in records:
+            try:
+                if fmt != 'csv':
+                    try:
+                        record = json.loads(record)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"invalid JSON ({e.msg})")
+                yield parse_task_record(record)
+            except ValueError as e:
+                if on_error:
+                    on_error(line_number, str(e))
+
+
+@cli.command('import')
+@click.argument('goal_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help="File format (default: from the file extension)")
+@click.option('--chunk-size', default=1000, show_default=True,
+              help="Tasks per transaction")
+def import_tasks(goal_id, path, fmt, chunk_size):
+    """Import tasks for a goal from a CSV or JSONL file.
+
+    Each record needs a description and may have estimated_hours and due_date.
+    Invalid records are skipped and reported by line number.
+    """
+    if db.get_goal(goal_id) is None:
+        click.echo(f"  No goal with ID {goal_id}.")
+        return
+    if not fmt:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+    skipped = []
+
+    def on_error(line_number, message):
+        skipped.append(line_number)
+        if len(skipped) <= 20:
+            click.echo(f"  Skipped line {line_number}: {message}")
+
+    tasks = read_task_file(path, fmt, on_error)
+    total = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(tasks, chunk_size))
+            if not chunk:
+                break
+            total += len(db.add_tasks_bulk(goal_id, chunk))
+    finally:
+        # Earlier chunks are committed even if a later one fails
+        if len(skipped) > 20:
+            click.echo(f"  ... and {len(skipped) - 20} more invalid lines")
+        line = f"  Imported {total} tasks into goal {goal_id}."
+        if skipped:
+            line += f" Skipped {len(skipped)} invalid records."
+        click.echo(line)
+
+
 @cli.command('list-goals')
 def list_goals():
     """List all active goals."""
-    goals = db.get_all_goals()
+    goals = db.get_dashboard()['goals']
     if not goals:
         click.echo("  No active goals.")
         return
     click.echo()
     for g in goals:
-        goal_tasks = db.get_tasks_for_goal(g['id'])
-        done_count = sum(1 for t in goal_tasks if t['status'] == 'done')
-        click.echo(f"  [{g['id']}] {g['name']} ({done_count}/{len(goal_tasks)} tasks)")
+        click.echo(f"  [{g['id']}] {g['name']} ({g['done_count']}/{g['total_count']} tasks)")
         if g.get('deadline'):
             click.echo(f"      Deadline: {g['deadline']}")
     click.echo()
@@ -520,22 +1012,27 @@ def list_goals():
 @click.argument('goal_id', type=int)
 def list_tasks(goal_id):
     """List tasks for a goal."""
-    tasks = db.get_tasks_for_goal(goal_id)
-    if not tasks:
+    tasks = db.iter_tasks(goal_id=goal_id)
+    first = next(tasks, None)
+    if first is None:
         click.echo(f"  No tasks for goal {goal_id}")
         return
 
     goal = db.get_goal(goal_id)
-    click.echo(f"\n  {goal['name']}:\n")
-    for t in tasks:
-        icon = "x" if t['status'] == 'done' else " "
-        line = f"  [{icon}] {t['id']}: {t['description']}"
-        if t.get('estimated_hours'):
-            line += f" ({t['estimated_hours']}h)"
-        if t.get('due_date'):
-            line += f" — due {t['due_date']}"
-        click.echo(line)
-    click.echo()
+
+    def lines():
+        yield f"\n  {goal['name']}:\n"
+        for t in itertools.chain([first], tasks):
+            icon = "x" if t['status'] == 'done' else " "
+            line = f"  [{icon}] {t['id']}: {t['description']}"
+            if t.get('estimated_hours'):
+                line += f" ({t['estimated_hours']}h)"
+            if t.get('due_date'):
+                line += f" — due {t['due_date']}"
+            yield line
+        yield ""
+
+    echo_lines(lines())
 
 
 @cli.command()
@@ -546,6 +1043,53 @@ def done(task_id):
     click.echo(f"  Done! Task {task_id} complete.")
 
 
+@cli.command('log')
+@click.argument('task_id', type=int)
+@click.argument('hours', type=float)
+@click.argument('notes', nargs=-1)
+def log_command(task_id, hours, notes):
+    """Log hours spent on a task (with optional notes)."""
+    log_time(task_id, hours, " ".join(notes))
+
+
+@cli.command()
+@click.option('--weeks', default=8, show_default=True, help="Weeks in the weekly chart")
+@click.option('--days', default=30, show_default=True, help="Window for hours by goal")
+def stats(weeks, days):
+    """Time-tracking report: hours by goal and week, streaks, estimate accuracy."""
+    week_rows = analytics.hours_by_week(weeks)
+    last_7 = sum(row['hours'] for row in analytics.hours_by_day(7))
+    streaks = analytics.streaks()
+    if not any(row['hours'] for row in week_rows) and not streaks['longest']:
+        click.echo("  No time logged yet. Log some with: compass log <task_id> <hours>")
+        return
+
+    click.echo(f"\n  This week: {week_rows[-1]['hours']:g}h | Last 7 days: {last_7:g}h | "
+               f"Streak: {streaks['current']} days (best {streaks['longest']})\n")
+
+    by_goal = analytics.hours_by_goal(since=(datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d"))
+    if by_goal:
+        click.echo(f"  By goal (last {days} days):")
+        for row in by_goal:
+            click.echo(f"    {row['name'][:40]:<40} {row['hours']:>7.1f}h")
+        click.echo()
+
+    click.echo(f"  Last {weeks} weeks:")
+    peak = max(row['hours'] for row in week_rows) or 1
+    for row in week_rows:
+        bar = "█" * round(row['hours'] / peak * 30)
+        click.echo(f"    {row['week']}  {bar:<30} {row['hours']:>6.1f}h")
+    click.echo()
+
+    accuracy = analytics.estimate_accuracy()
+    if accuracy:
+        click.echo("  Estimates vs actual (completed tasks):")
+        for row in accuracy:
+            click.echo(f"    {row['name'][:40]:<40} {row['tasks']:>3} tasks, "
+                       f"est {row['estimated']:g}h, took {row['actual']:g}h ({row['ratio']:.2f}x)")
+        click.echo()
+
+
 @cli.command()
 @click.argument('task_id', type=int)
 def undone(task_id):
@@ -571,6 +1115,82 @@ def delete_goal(goal_id):
         click.echo(f"  Deleted goal {goal_id}.")
 
 
+@cli.command('complete-goal')
+@click.argument('goal_id', type=int)
+def complete_goal(goal_id):
+    """Mark a goal as completed (it leaves the dashboard and can be archived)."""
+    if not db.get_goal(goal_id):
+        click.echo(f"  No goal with ID {goal_id}.")
+        return
+    db.set_goal_status(goal_id, 'completed')
+    click.echo(f"  Goal {goal_id} completed.")
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def echo_vacuum(max_pages=None):
+    result = db.vacuum(max_pages)
+    how = "Full VACUUM (switched to incremental)" if result['full_vacuum'] else "Incremental vacuum"
+    click.echo(f"  {how}: reclaimed {format_bytes(max(result['reclaimed_bytes'], 0))}, "
+               f"database now {format_bytes(result['size_bytes'])}"
+               + (f" ({format_bytes(result['free_bytes'])} still free)" if result['free_bytes'] else ""))
+
+
+@cli.command()
+@click.option('--older-than', default=30, show_default=True,
+              help="Archive finished goals idle for this many days")
+@click.option('--dry-run', is_flag=True, help="List what would be archived")
+@click.option('--restore', 'restore_id', type=int, help="Move an archived goal back")
+@click.option('--list', 'list_archived', is_flag=True, help="List archived goals")
+def archive(older_than, dry_run, restore_id, list_archived):
+    """Move finished goals, their tasks and logs into the archive tables."""
+    if restore_id is not None:
+        if db.restore_goal(restore_id):
+            click.echo(f"  Restored goal {restore_id}.")
+        else:
+            click.echo(f"  Goal {restore_id} isn't archived.")
+        return
+
+    if list_archived:
+        goals = db.get_archived_goals()
+        if not goals:
+            click.echo("  No archived goals.")
+        for g in goals:
+            click.echo(f"  [{g['id']}] {g['name']} ({g['total_count']} tasks, "
+                       f"{g['status']}) — archived {g['archived_at'][:10]}")
+        return
+
+    goals = db.get_archivable_goals(older_than)
+    if not goals:
+        click.echo(f"  Nothing to archive (no finished goals idle for {older_than}+ days).")
+    for g in goals:
+        click.echo(f"  [{g['id']}] {g['name']} ({g['done_count']}/{g['total_count']} tasks, "
+                   f"{g['status']}) — last activity {g['last_activity'][:10]}")
+    if dry_run:
+        return
+
+    moved = db.archive_goals([g['id'] for g in goals])
+    if goals:
+        click.echo(f"\n  Archived {moved['goals']} goals, {moved['tasks']} tasks, "
+                   f"{moved['daily_logs']} logs.")
+    if moved['orphaned_logs']:
+        click.echo(f"  Archived {moved['orphaned_logs']} logs whose task had been deleted.")
+    echo_vacuum()
+
+
+@cli.command()
+@click.option('--pages', type=int, help="Free at most this many pages (default: all)")
+def vacuum(pages):
+    """Return free space in the database file to the filesystem."""
+    echo_vacuum(pages)
+
+
 # ======================================================================
 # Profile management
 # ======================================================================
@@ -0,0 +1,306 @@
+"""Local stand-in for the Anthropic Messages API, for offline benchmarks.
+
+Serves POST /v1/messages (plain and streaming) from a list of canned
+responses, with configurable latency and jitter, plus the Message Batches
+endpoints (create, retrieve, results). Point Agent at it with
+Agent(base_url=...) or ANTHROPIC_BASE_URL.
+
+    python mock_server.py --port 8765 --latency 0.8 --jitter 0.2
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict
+
+
+# Canned replies for Compass's prompts. The first entry whose 'match'
+# appears in the request's last user message, system prompt or forced
+# tool name wins; an entry without 'match' is the fallback. For a forced
+# tool call, 'text' is the tool input as JSON.
+DEFAULT_RECORDINGS = [
+    {"match": "save_tasks",
+     "text": json.dumps({"tasks": [
+         {"description": "Write down the three skills the target role needs most",
+          "estimated_hours": 1, "due_date": None},
+         {"description": "Build a small project that exercises the first skill",
+          "estimated_hours": 6, "due_date": None},
+         {"description": "Write up what you learned and share it",
+          "estimated_hours": 2, "due_date": None},
+     ]})},
+    {"match": "update_profile",
+     "text": json.dumps({"current_role": "Software Engineer", "experience_years": 3})},
+    {"match": "daily check-in",
+     "text": "Morning. You have work waiting from yesterday. What are you tackling first today?"},
+    {"match": "set up a new goal",
+     "text": "Where are you starting from, and what does done look like for you?"},
+    {"match": "running summary",
+     "text": "The user is working through their active tasks and committed to a plan for today."},
+    {"text": "Got it. What's the one thing you'll finish before the end of the day?"},
+]
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class MockAnthropicServer:
+    """Messages API stand-in running on a background thread.
+
+    latency: seconds before the first byte (plus uniform +/- jitter).
+    tokens_per_second: streaming speed after the first byte; plain
+    responses also wait for the full "generation" before replying.
+    batch_seconds: how long a message batch stays "in_progress".
+    """
+
+    def __init__(self, recordings: List[Dict] = None, latency: float = 0.5,
+                 jitter: float = 0.1, tokens_per_second: float = 80.0,
+                 host: str = "127.0.0.1", port: int = 0, batch_seconds: float = 2.0):
+        self.recordings = recordings or DEFAULT_RECORDINGS
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.batch_seconds = batch_seconds
+        self.requests = 0
+        self.batches = {}  # batch id -> {'created': monotonic time, 'results': [...]}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockAnthropicServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reply_for(self, request: Dict) -> str:
+        """Pick the canned reply for a request."""
+        system = request.get("system") or ""
+        if isinstance(system, list):
+            system = "".join(block.get("text", "") for block in system)
+        last = request["messages"][-1]["content"] if request.get("messages") else ""
+        if isinstance(last, list):
+            last = "".join(block.get("text", "") for block in last if isinstance(block, dict))
+        tool = (request.get("tool_choice") or {}).get("name", "")
+        haystack = f"{system}\n{last}\n{tool}"
+        for recording in self.recordings:
+            if "match" not in recording or recording["match"] in haystack:
+                return recording["text"]
+        return ""
+
+    def message_for(self, request: Dict) -> Dict:
+        """Full (non-streaming) Message body for a request."""
+        text = self.reply_for(request)
+        tool = (request.get("tool_choice") or {}).get("name")
+        if tool:
+            content = {"type": "tool_use", "id": f"toolu_mock_{self.requests}",
+                       "name": tool, "input": json.loads(text)}
+        else:
+            content = {"type": "text", "text": text}
+        return {
+            "id": f"msg_mock_{self.requests}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "mock"),
+            "content": [content],
+            "stop_reason": "tool_use" if tool else "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": _estimate_tokens(json.dumps(request.get("messages", []))),
+                "output_tokens": _estimate_tokens(text),
+            },
+        }
+
+    def create_batch(self, body: Dict) -> Dict:
+        batch_id = f"msgbatch_mock_{len(self.batches) + 1}"
+        results = []
+        for entry in body.get("requests", []):
+            self.requests += 1
+            results.append({
+                "custom_id": entry["custom_id"],
+                "result": {"type": "succeeded", "message": self.message_for(entry["params"])},
+            })
+        self.batches[batch_id] = {"created": time.monotonic(), "results": results}
+        return self.batch_object(batch_id)
+
+    def batch_object(self, batch_id: str) -> Dict:
+        batch = self.batches[batch_id]
+        ended = time.monotonic() - batch["created"] >= self.batch_seconds
+        count = len(batch["results"])
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else count,
+                               "succeeded": count if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": now,
+            "expires_at": now,
+            "ended_at": now if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": (f"{self.base_url}/v1/messages/batches/{batch_id}/results"
+                            if ended else None),
+        }
+
+    def first_byte_delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?")[0].rstrip("/")
+                parts = path.split("/")
+                if path.startswith("/v1/messages/batches/") and parts[4] in server.batches:
+                    if len(parts) == 6 and parts[5] == "results":
+                        lines = "".join(json.dumps(r) + "\n"
+                                        for r in server.batches[parts[4]]["results"])
+                        self._body(lines.encode(), "application/binary")
+                        return
+                    if len(parts) == 5:
+                        self._json(server.batch_object(parts[4]))
+                        return
+                self.send_error(404)
+
+            def do_POST(self):
+                if not self.path.startswith("/v1/messages"):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+
+                if self.path.split("?")[0].rstrip("/") == "/v1/messages/batches":
+                    self._json(server.create_batch(request))
+                    return
+
+                server.requests += 1
+                message = server.message_for(request)
+                time.sleep(server.first_byte_delay())
+
+                if request.get("stream"):
+                    self._stream(request, message)
+                else:
+                    time.sleep(message["usage"]["output_tokens"] / server.tokens_per_second)
+                    self._json(message)
+
+            def _json(self, body: Dict):
+                self._body(json.dumps(body).encode(), "application/json")
+
+            def _body(self, data: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _event(self, event: str, data: Dict):
+                payload = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+                self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, request: Dict, message: Dict):
+                usage = message["usage"]
+                block = message["content"][0]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                self._event("message_start", {"type": "message_start", "message": {
+                    "id": f"msg_mock_{server.requests}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": request.get("model", "mock"),
+                    "content": [],
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 1},
+                }})
+                if block["type"] == "tool_use":
+                    start = {**block, "input": {}}
+                    text = json.dumps(block["input"])
+                    delta = lambda chunk: {"type": "input_json_delta", "partial_json": chunk}
+                else:
+                    start = {"type": "text", "text": ""}
+                    text = block["text"]
+                    delta = lambda chunk: {"type": "text_delta", "text": chunk}
+                self._event("content_block_start", {
+                    "type": "content_block_start", "index": 0, "content_block": start,
+                })
+                # Roughly one token (4 characters) per delta
+                delay = 1.0 / server.tokens_per_second
+                for i in range(0, len(text), 4):
+                    self._event("content_block_delta", {
+                        "type": "content_block_delta", "index": 0,
+                        "delta": delta(text[i:i + 4]),
+                    })
+                    time.sleep(delay)
+                self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+                self._event("message_delta", {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                    "usage": {"output_tokens": usage["output_tokens"]},
+                })
+                self._event("message_stop", {"type": "message_stop"})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to first byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds on latency")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--batch-seconds", type=float, default=2.0,
+                        help="how long message batches take to end")
+    parser.add_argument("--recordings", help="JSON file: list of {match?, text}")
+    args = parser.parse_args()
+
+    recordings = None
+    if args.recordings:
+        with open(args.recordings) as f:
+            recordings = json.load(f)
+
+    server = MockAnthropicServer(recordings, args.latency, args.jitter,
+                                 args.tokens_per_second, args.host, args.port,
+                                 args.batch_seconds)
+    print(f"Mock Anthropic API on {server.base_url} (Ctrl-C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import json
+import time
+import random
+import threading
+from typing import Callable, Dict, Optional
+
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server
+# errors and 529 "overloaded".
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+def estimate_request_tokens(request: Dict) -> int:
+    """Rough token cost of a messages.create request (input plus max output)."""
+    text = json.dumps(request.get("messages", [])) + json.dumps(request.get("system", ""))
+    return len(text) // 4 + request.get("max_tokens", 0)
+
+
+class TokenBucket:
+    """Refills at rate units/second up to capacity; reservations may go into debt.
+
+    reserve() always succeeds and returns how long the caller must wait
+    before its reservation is covered, so callers are served in order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """Rate limiting, retries and deadlines for Anthropic API calls.
+
+    Every call reserves one request and its estimated tokens from two
+    token buckets (requests/min and tokens/min) and waits until both are
+    covered, so bursts queue up instead of tripping 429s. Retryable
+    failures are retried with jittered exponential backoff, or after the
+    server's retry-after header when it sends one. Nothing is retried
+    past the call's deadline.
+    """
+
+    def __init__(self, requests_per_minute: float = 50, tokens_per_minute: float = 80000,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 deadline: float = 120.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self.metrics = {
+            "calls": 0,
+            "retries": 0,
+            "failures": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Bookkeeping
+    # ------------------------------------------------------------------
+
+    def _reserve(self, tokens: int, deadline: float) -> float:
+        """Reserve capacity; return the wait, or raise if it overshoots the deadline."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            if now + wait > deadline:
+                self.requests.refund(1, now)
+                self.tokens.refund(tokens, now)
+                raise TimeoutError(f"Rate limit wait of {wait:.1f}s exceeds the call deadline")
+            self.metrics["queue_depth"] += 1
+            self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"],
+                                                  self.metrics["queue_depth"])
+            self.metrics["total_wait"] += wait
+            self.metrics["max_wait"] = max(self.metrics["max_wait"], wait)
+            return wait
+
+    def _dequeued(self):
+        with self._lock:
+            self.metrics["queue_depth"] -= 1
+            self.metrics["calls"] += 1
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Give back tokens a call reserved but didn't use."""
+        if actual_tokens < estimated_tokens:
+            with self._lock:
+                self.tokens.refund(estimated_tokens - actual_tokens, time.monotonic())
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying error, or None if it isn't retryable."""
+        status = getattr(error, "status_code", None)
+        if status not in RETRYABLE_STATUSES and type(error).__name__ not in RETRYABLE_ERRORS:
+            return None
+
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except ValueError:
+            pass  # HTTP-date form; fall back to backoff
+
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def _should_retry(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        delay = self._retry_delay(error, attempt)
+        if delay is None or attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            with self._lock:
+                self.metrics["failures"] += 1
+            return None
+        with self._lock:
+            self.metrics["retries"] += 1
+        return delay
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+
+    def call(self, send: Callable[[float], object], tokens: int, deadline: float = None):
+        """Run send(timeout) under the rate limits, retrying transient errors.
+
+        send gets the seconds left before the deadline, to use as its
+        request timeout.
+        """
+        deadline = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens, deadline)
+            time.sleep(wait)
+            self._dequeued()
+            try:
+                return send(deadline - time.monotonic())
+            except Exception as error:
+                delay = self._should_retry(error, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def acall(self, send: Callable[[float], object], tokens: int, deadline: float = None):
+        """call() for coroutines: send(timeout) returns an awaitable."""
+        import asyncio  # already loaded by whoever runs the event loop
+
+        deadline = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens, deadline)
+            await asyncio.sleep(wait)
+            self._dequeued()
+            try:
+                return await send(deadline - time.monotonic())
+            except Exception as error:
+                delay = self._should_retry(error, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> Dict:
+        """Snapshot of the metrics, with average wait per call."""
+        with self._lock:
+            stats = dict(self.metrics)
+        stats["avg_wait"] = stats["total_wait"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
@@ -0,0 +1,132 @@
+"""Round-trip tests for archive_goals/restore_goal and the log rollups.
+
+Logged hours must not change as goals move into the archive and back:
+the rollup tables stay equal to a recount over live and archived logs,
+the reports built on them are unchanged, and restoring every goal gives
+back the original rows. Run with: python -m unittest test_archive
+"""
+import random
+import unittest
+
+from analytics import Analytics
+from database import ARCHIVE_COLUMNS, Database
+
+SEEDS = range(10)
+TODAY = "2030-01-20"
+
+# Rollups recounted from scratch, live and archived rows alike
+RECOUNT_DAILY = """
+    SELECT l.date, COALESCE(t.goal_id, 0), ROUND(SUM(COALESCE(l.hours_spent, 0)), 6), COUNT(*)
+    FROM (SELECT * FROM daily_logs UNION ALL SELECT * FROM daily_logs_archive) l
+    LEFT JOIN (SELECT id, goal_id FROM tasks UNION ALL SELECT id, goal_id FROM tasks_archive) t
+        ON t.id = l.task_id
+    GROUP BY 1, 2 ORDER BY 1, 2"""
+RECOUNT_TASKS = """
+    SELECT task_id, ROUND(SUM(COALESCE(hours_spent, 0)), 6), COUNT(*)
+    FROM (SELECT * FROM daily_logs UNION ALL SELECT * FROM daily_logs_archive)
+    WHERE task_id IS NOT NULL
+    GROUP BY 1 ORDER BY 1"""
+
+
+class ArchiveRoundTripTest(unittest.TestCase):
+    def populate(self, rng: random.Random):
+        db = self.db
+        for g in range(rng.randint(2, 6)):
+            goal_id = db.add_goal(f"Goal {g}", category=rng.choice(["learning", "health"]))
+            for t in range(rng.randint(0, 5)):
+                task_id = db.add_task(goal_id, f"Task {g}.{t}", rng.choice([None, 1, 2.5]),
+                                      f"2030-01-{rng.randint(1, 28):02d}")
+                for _ in range(rng.randint(0, 4)):
+                    db.log_progress(task_id, rng.choice([0.25, 0.5, 1.0, 1.5]), "practice",
+                                    date=f"2030-01-{rng.randint(1, 20):02d}")
+                if rng.random() < 0.5:
+                    db.complete_task(task_id)
+            if rng.random() < 0.3:
+                db.set_goal_status(goal_id, 'completed')
+        # Logs left behind by older versions of delete_task/delete_goal
+        for task_id in (None, 9999):
+            db.conn.execute("INSERT INTO daily_logs (date, task_id, hours_spent) VALUES (?, ?, ?)",
+                            (TODAY, task_id, 2.0))
+        db.conn.commit()
+
+    def rollups(self) -> dict:
+        conn = self.db.conn
+        return {
+            "daily": [tuple(row) for row in conn.execute(
+                "SELECT date, goal_id, ROUND(hours, 6), entries FROM log_daily_rollup "
+                "WHERE entries != 0 ORDER BY 1, 2")],
+            "tasks": [tuple(row) for row in conn.execute(
+                "SELECT task_id, ROUND(hours, 6), entries FROM log_task_rollup "
+                "WHERE entries != 0 ORDER BY 1")],
+        }
+
+    def recount(self) -> dict:
+        conn = self.db.conn
+        return {
+            "daily": [tuple(row) for row in conn.execute(RECOUNT_DAILY)],
+            "tasks": [tuple(row) for row in conn.execute(RECOUNT_TASKS)],
+        }
+
+    def reports(self) -> dict:
+        analytics = Analytics(self.db)
+        return {
+            "hours_by_day": analytics.hours_by_day(30, TODAY),
+            "hours_by_week": analytics.hours_by_week(8, TODAY),
+            "estimate_accuracy": analytics.estimate_accuracy(),
+            "streaks": analytics.streaks(TODAY),
+        }
+
+    def live_rows(self, table: str) -> list:
+        return [tuple(row) for row in self.db.conn.execute(
+            f"SELECT {ARCHIVE_COLUMNS[table]} FROM {table} ORDER BY id")]
+
+    def test_archive_and_restore_keep_logged_hours(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                self.db = Database(":memory:")
+                rng = random.Random(seed)
+                self.populate(rng)
+                rollups, reports = self.rollups(), self.reports()
+                self.assertEqual(rollups, self.recount())
+                goal_ids = [row[0] for row in self.db.conn.execute("SELECT id FROM goals")]
+
+                archived = rng.sample(goal_ids, rng.randint(1, len(goal_ids)))
+                self.db.archive_goals(archived)
+                self.assertEqual(self.rollups(), rollups)
+                self.assertEqual(self.recount(), rollups)
+                self.assertEqual(self.reports(), reports)
+
+                for goal_id in rng.sample(archived, len(archived)):
+                    self.assertTrue(self.db.restore_goal(goal_id))
+                    self.assertEqual(self.rollups(), rollups)
+                    self.assertEqual(self.recount(), rollups)
+                self.assertEqual(self.reports(), reports)
+
+    def test_restore_gives_back_the_original_rows(self):
+        self.db = Database(":memory:")
+        self.populate(random.Random(0))
+        # Orphaned logs are swept into the archive and stay there
+        self.db.conn.execute("DELETE FROM daily_logs WHERE task_id IS NULL OR task_id = 9999")
+        self.db.conn.commit()
+        before = {table: self.live_rows(table) for table in ARCHIVE_COLUMNS}
+        goal_ids = [row[0] for row in self.db.conn.execute("SELECT id FROM goals")]
+
+        counts = self.db.archive_goals(goal_ids)
+        self.assertEqual(counts["goals"], len(goal_ids))
+        self.assertEqual({table: self.live_rows(table) for table in ARCHIVE_COLUMNS},
+                         {table: [] for table in ARCHIVE_COLUMNS})
+        self.assertEqual(self.db.search("Task"), [])
+
+        for goal_id in goal_ids:
+            self.db.restore_goal(goal_id)
+        self.assertEqual({table: self.live_rows(table) for table in ARCHIVE_COLUMNS}, before)
+        self.assertEqual(len(self.db.get_archived_goals()), 0)
+        self.assertTrue(self.db.search("Task"))
+
+    def test_restore_of_unknown_goal(self):
+        self.db = Database(":memory:")
+        self.assertFalse(self.db.restore_goal(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
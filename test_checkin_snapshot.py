@@ -0,0 +1,110 @@
+"""Randomized equivalence tests for the trigger-maintained check-in snapshot.
+
+Random writes go through the Database methods and raw SQL alike; after
+each one the snapshot must list the same tasks as direct queries over
+tasks. Run with: python -m unittest test_checkin_snapshot
+"""
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from database import Database
+
+SEEDS = range(20)
+STEPS = 60
+
+
+def shift(date: str, days: int) -> str:
+    return (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+class CheckinSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.today = datetime.now().strftime("%Y-%m-%d")
+
+    def direct(self, date: str) -> dict:
+        """Task IDs per snapshot kind on date, queried straight from tasks"""
+        queries = {
+            "today": ("SELECT id FROM tasks WHERE due_date = ?", date),
+            "overdue": ("SELECT id FROM tasks WHERE due_date < ? AND status != 'done'", date),
+            # completed_at is UTC; "yesterday" is the local calendar day
+            "yesterday": ("SELECT id FROM tasks WHERE date(completed_at, 'localtime') = ?",
+                          shift(date, -1)),
+        }
+        return {kind: sorted(row[0] for row in self.db.conn.execute(sql, (param,)))
+                for kind, (sql, param) in queries.items()}
+
+    def snapshot(self) -> dict:
+        return {kind: sorted(task['id'] for task in tasks)
+                for kind, tasks in self.db._read_checkin_snapshot().items()}
+
+    def random_write(self, rng: random.Random):
+        db = self.db
+        goal_ids = [goal['id'] for goal in db.get_all_goals()]
+        task_ids = [row[0] for row in db.conn.execute("SELECT id FROM tasks")]
+        due = rng.choice([None] + [shift(self.today, d) for d in range(-3, 4)])
+        action = rng.randrange(9) if task_ids else 0
+
+        if action == 0 or not goal_ids:
+            goal_id = rng.choice(goal_ids) if goal_ids and rng.random() < 0.8 else db.add_goal("Goal")
+            db.add_task(goal_id, "Task", due_date=due)
+        elif action == 1:
+            db.add_tasks_bulk(rng.choice(goal_ids), [{'description': "Bulk", 'due_date': due}
+                                                      for _ in range(rng.randint(1, 3))])
+        elif action == 2:
+            db.complete_task(rng.choice(task_ids))
+        elif action == 3:
+            db.uncomplete_task(rng.choice(task_ids))
+        elif action == 4:
+            # Completed some time in the last few days, UTC like complete_task
+            minutes = rng.randint(-4 * 24 * 60, 0)
+            db.conn.execute("UPDATE tasks SET status = 'done', completed_at = datetime('now', ?) "
+                            "WHERE id = ?", (f"{minutes} minutes", rng.choice(task_ids)))
+            db.conn.commit()
+        elif action == 5:
+            db.conn.execute("UPDATE tasks SET due_date = ? WHERE id = ?", (due, rng.choice(task_ids)))
+            db.conn.commit()
+        elif action == 6:
+            db.delete_task(rng.choice(task_ids))
+        elif action == 7:
+            db.archive_goals([rng.choice(goal_ids)])
+        else:
+            archived = [goal['id'] for goal in db.get_archived_goals()]
+            if archived:
+                db.restore_goal(rng.choice(archived))
+
+    def test_snapshot_matches_direct_queries(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                self.setUp()
+                rng = random.Random(seed)
+                for step in range(STEPS):
+                    self.random_write(rng)
+                    self.assertEqual(self.snapshot(), self.direct(self.today), f"step {step}")
+
+    def test_other_dates_match_direct_queries(self):
+        rng = random.Random(0)
+        for _ in range(STEPS):
+            self.random_write(rng)
+        for days in range(-3, 4):
+            date = shift(self.today, days)
+            with self.subTest(date=date):
+                context = self.db.get_checkin_context(date)
+                got = {
+                    "today": sorted(t['id'] for t in context['today_tasks']),
+                    "overdue": sorted(t['id'] for t in context['overdue_tasks']),
+                    "yesterday": sorted(t['id'] for t in context['yesterday_tasks']),
+                }
+                self.assertEqual(got, self.direct(date))
+
+    def test_stale_snapshot_rebuilds_on_read(self):
+        rng = random.Random(1)
+        for _ in range(STEPS):
+            self.random_write(rng)
+        self.db.refresh_checkin_snapshot(shift(self.today, -5))
+        self.assertEqual(self.snapshot(), self.direct(self.today))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""EXPLAIN QUERY PLAN regression tests for the Database and Analytics queries.
+
+Every query each method runs is recorded and re-planned with the same
+parameters; a full-table SCAN fails the test unless it is listed in
+INTENDED_SCANS. Run with: python -m unittest test_query_plans
+"""
+import unittest
+
+from analytics import Analytics
+from database import Database
+
+TODAY = "2030-01-10"
+
+# Full scans that are intended: plan detail -> the calls allowed to have
+# it ("*" for any). Any other plan step starting with SCAN is a failure.
+INTENDED_SCANS = {
+    # checkin_snapshot_meta holds exactly one row
+    "SCAN checkin_snapshot_meta": {"*"},
+    "SCAN d": {"*"},
+    # A one-row (SELECT ? AS ...) subquery
+    "SCAN CONSTANT ROW": {"*"},
+    # Virtual tables plan through their own xBestIndex
+    "SCAN search_index VIRTUAL TABLE INDEX 0:M4": {"search"},
+    "SCAN json_each VIRTUAL TABLE INDEX 1:": {"archive_goals"},
+    # The search CTE, at most `limit` rows
+    "SCAN h": {"search"},
+    # The whole snapshot is what a check-in reads
+    "SCAN s": {"get_checkin_context"},
+    # Unfiltered first page: walks the (created_at) index, stops at LIMIT
+    "SCAN tasks USING INDEX idx_tasks_created": {"get_tasks_page"},
+    # Partial index: every entry is an active task, so the scan is the result
+    "SCAN tasks USING INDEX idx_tasks_active_created": {"get_all_active_tasks"},
+    # Dashboard totals count over all tasks from the covering index
+    "SCAN tasks USING COVERING INDEX idx_tasks_due_status": {"get_dashboard"},
+    # The archive policy and archive listing look at every goal
+    "SCAN g": {"get_archivable_goals", "get_archived_goals"},
+    # Orphaned logs are, by definition, not reachable through an index
+    "SCAN daily_logs": {"archive_goals"},
+    # Estimate accuracy reads the per-task rollup (one row per task with
+    # time logged), looking each task up live or archived by id
+    "SCAN r": {"estimate_accuracy"},
+    # Streaks need the full history; the rollup has one row per day and goal
+    "SCAN log_daily_rollup": {"streaks"},
+}
+
+
+class RecordingConnection:
+    """Wraps a sqlite3 connection and records every statement it runs"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.statements = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return self._conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        self.statements.append((sql, rows[0] if rows else ()))
+        return self._conn.executemany(sql, rows)
+
+
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.db = Database(":memory:")
+        self.analytics = Analytics(self.db)
+        self.goal_id = self.db.add_goal("Learn piano", "scales", category="learning")
+        self.task_id = self.db.add_task(self.goal_id, "Practice scales", 2, TODAY)
+        self.db.add_tasks_bulk(self.goal_id, [
+            {'description': "Overdue piece", 'estimated_hours': 1, 'due_date': "2030-01-01"},
+            {'description': "Someday", 'estimated_hours': 3},
+        ])
+        self.db.complete_task(self.task_id)
+        self.db.log_progress(self.task_id, 1.5, "left hand", date=TODAY)
+        self.db.refresh_checkin_snapshot(TODAY)
+        self.db.conn = RecordingConnection(self.db.conn)
+
+    def calls(self):
+        db, analytics, goal_id, task_id = self.db, self.analytics, self.goal_id, self.task_id
+        after = ("2000-01-01 00:00:00", 0)
+        return [
+            ("get_all_goals", lambda: db.get_all_goals()),
+            ("get_goal", lambda: db.get_goal(goal_id)),
+            ("get_tasks_for_goal", lambda: db.get_tasks_for_goal(goal_id)),
+            ("get_tasks_for_goal", lambda: db.get_tasks_for_goal(goal_id, 'done')),
+            ("get_all_active_tasks", lambda: db.get_all_active_tasks()),
+            ("get_dashboard", lambda: db.get_dashboard()),
+            ("get_tasks_page", lambda: db.get_tasks_page()),
+            ("get_tasks_page", lambda: db.get_tasks_page(after=after)),
+            ("get_tasks_page", lambda: db.get_tasks_page(goal_id=goal_id, after=after)),
+            ("get_tasks_page", lambda: db.get_tasks_page(status='todo', after=after)),
+            ("get_tasks_page", lambda: db.get_tasks_page(active_only=True, after=after)),
+            ("get_tasks_page", lambda: db.get_tasks_page(goal_id=goal_id, active_only=True)),
+            ("refresh_checkin_snapshot", lambda: db.refresh_checkin_snapshot("2030-01-11")),
+            ("get_checkin_context", lambda: db.get_checkin_context()),
+            ("get_checkin_context", lambda: db.get_checkin_context("2030-02-01")),
+            ("get_todays_tasks", lambda: db.get_todays_tasks()),
+            ("get_overdue_tasks", lambda: db.get_overdue_tasks()),
+            ("get_yesterdays_completed_tasks", lambda: db.get_yesterdays_completed_tasks()),
+            ("save_checkin_greeting", lambda: db.save_checkin_greeting(TODAY, "Morning.")),
+            ("take_checkin_greeting", lambda: db.take_checkin_greeting(TODAY)),
+            ("search", lambda: db.search("scales")),
+            ("add_tasks_bulk", lambda: db.add_tasks_bulk(goal_id, [{'description': "Arpeggios"}])),
+            ("complete_task", lambda: db.complete_task(task_id)),
+            ("uncomplete_task", lambda: db.uncomplete_task(task_id)),
+            ("log_progress", lambda: db.log_progress(task_id, 0.5)),
+            ("update_goal_context", lambda: db.update_goal_context(goal_id, "{}")),
+            ("set_goal_status", lambda: db.set_goal_status(goal_id, 'completed')),
+            ("hours_by_day", lambda: analytics.hours_by_day(14, TODAY)),
+            ("hours_by_week", lambda: analytics.hours_by_week(8, TODAY)),
+            ("hours_by_goal", lambda: analytics.hours_by_goal()),
+            ("estimate_accuracy", lambda: analytics.estimate_accuracy()),
+            ("task_hours", lambda: analytics.task_hours(task_id)),
+            ("streaks", lambda: analytics.streaks(TODAY)),
+            ("get_archivable_goals", lambda: db.get_archivable_goals(0)),
+            ("archive_goals", lambda: db.archive_goals([goal_id])),
+            ("get_archived_goals", lambda: db.get_archived_goals()),
+            ("restore_goal", lambda: db.restore_goal(goal_id)),
+            ("delete_task", lambda: db.delete_task(task_id)),
+            ("delete_goal", lambda: db.delete_goal(goal_id)),
+        ]
+
+    def plan(self, sql, params):
+        rows = self.db.conn._conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row['detail'] for row in rows]
+
+    def test_no_unintended_full_scans(self):
+        for name, call in self.calls():
+            with self.subTest(call=name):
+                self.db.conn.statements = []
+                call()
+                for sql, params in self.db.conn.statements:
+                    if sql.lstrip().upper().startswith(("PRAGMA", "BEGIN")):
+                        continue
+                    for detail in self.plan(sql, params):
+                        if not detail.startswith("SCAN"):
+                            continue
+                        allowed = INTENDED_SCANS.get(detail, set())
+                        self.assertTrue(
+                            "*" in allowed or name in allowed,
+                            f"{name}: unexpected '{detail}' in\n{sql}"
+                        )
+
+    def test_intended_scans_still_happen(self):
+        """Keep INTENDED_SCANS honest: drop entries no query produces any more."""
+        seen = set()
+        for name, call in self.calls():
+            self.db.conn.statements = []
+            call()
+            for sql, params in self.db.conn.statements:
+                if not sql.lstrip().upper().startswith(("PRAGMA", "BEGIN")):
+                    seen.update(self.plan(sql, params))
+        self.assertEqual(set(INTENDED_SCANS) - seen, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""Chunking tests for the incremental stream parsers in agent.py.
+
+Each parser is fed the same text split at random points and must produce
+what it would for the text in one piece. Run with:
+python -m unittest test_stream_parsers
+"""
+import json
+import random
+import unittest
+
+from agent import Agent, JSONArrayStreamParser, MarkdownStreamCleaner
+
+SEEDS = range(200)
+
+WORDS = ["plan", "the", "week", "task_3", "snake_case", "a*b", "2*3", "**bold**", "*it*",
+         "_it_", "__under__", "*", "_", "**", "__", "done.", "first", "then"]
+
+
+def chunked(text: str, rng: random.Random) -> list:
+    """text split at random points (empty chunks included)"""
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, len(text))))
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+class MarkdownStreamCleanerTest(unittest.TestCase):
+    def setUp(self):
+        self.clean = Agent()._clean_markdown
+
+    def stream(self, chunks) -> str:
+        cleaner = MarkdownStreamCleaner(self.clean)
+        out = []
+        for chunk in chunks:
+            out.append(cleaner.feed(chunk))
+            self.assertLessEqual(len(cleaner.pending), MarkdownStreamCleaner.MAX_HOLD)
+        return "".join(out) + cleaner.flush()
+
+    def random_text(self, rng: random.Random) -> str:
+        """A few lines of words and markers, each short enough never to hit MAX_HOLD"""
+        lines = []
+        for _ in range(rng.randint(1, 4)):
+            line = ""
+            for word in rng.choices(WORDS, k=rng.randint(0, 12)):
+                if len(line) + len(word) + 1 > MarkdownStreamCleaner.MAX_HOLD:
+                    break
+                line += (" " if line else "") + word
+            lines.append(line)
+        return "\n".join(lines) + rng.choice(["", "\n"])
+
+    def test_any_chunking_matches_cleaning_the_whole_text(self):
+        for seed in SEEDS:
+            rng = random.Random(seed)
+            text = self.random_text(rng)
+            with self.subTest(seed=seed, text=text):
+                self.assertEqual(self.stream(chunked(text, rng)), self.clean(text))
+
+    def test_text_before_a_marker_is_not_held(self):
+        cleaner = MarkdownStreamCleaner(self.clean)
+        self.assertEqual(cleaner.feed("Start with "), "Start with ")
+        self.assertEqual(cleaner.feed("task_3"), "task")
+        self.assertEqual(cleaner.feed(" today.\nNext"), "_3 today.\nNext")
+
+    def test_lone_marker_does_not_hold_the_rest_of_the_line(self):
+        text = ("Start with task_3 today. It unblocks the release notes and the rest "
+                "of the week's plan, so it's worth doing first thing this morning.")
+        cleaner = MarkdownStreamCleaner(self.clean)
+        streamed = "".join(cleaner.feed(text[i:i + 4]) for i in range(0, len(text), 4))
+        self.assertIn("release notes", streamed)
+        self.assertEqual(streamed + cleaner.flush(), text)
+
+
+def random_string(rng: random.Random) -> str:
+    """Full of the characters the parser tracks outside strings"""
+    return "".join(rng.choices('ab "\\[]{},:\n\u00e9', k=rng.randint(0, 8)))
+
+
+def random_value(rng: random.Random, depth: int = 0):
+    kind = rng.randrange(6 if depth < 3 else 3)
+    if kind == 0:
+        return random_string(rng)
+    if kind == 1:
+        return rng.choice([0, -1.5, 3e10, 42])
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind == 3:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+    return {f"k{i}": random_value(rng, depth + 1) for i in range(rng.randint(0, 3))}
+
+
+class JSONArrayStreamParserTest(unittest.TestCase):
+    def parse(self, chunks) -> list:
+        parser = JSONArrayStreamParser()
+        items = []
+        for chunk in chunks:
+            items.extend(parser.feed(chunk))
+        return items
+
+    def test_any_chunking_yields_the_array_elements(self):
+        for seed in SEEDS:
+            rng = random.Random(seed)
+            elements = [random_value(rng) for _ in range(rng.randint(0, 5))]
+            document = json.dumps({"note": random_string(rng), "tasks": elements, "after": [1]},
+                                  indent=rng.choice([None, 2]), ensure_ascii=rng.random() < 0.5)
+            with self.subTest(seed=seed, document=document):
+                self.assertEqual(self.parse(chunked(document, rng)), elements)
+
+    def test_elements_are_returned_as_they_close(self):
+        parser = JSONArrayStreamParser()
+        self.assertEqual(parser.feed('{"tasks": [{"description": "a"}'), [{"description": "a"}])
+        self.assertEqual(parser.feed(', 7'), [])  # a scalar may still continue
+        self.assertEqual(parser.feed('0, "x"]'), [70, "x"])
+        self.assertEqual(parser.feed(', "more": [1]}'), [])
+
+    def test_malformed_elements_are_skipped(self):
+        document = '{"tasks": [{"a": 1}, {"b": nope}, tru, {"c": 2}]}'
+        self.assertEqual(self.parse([document]), [{"a": 1}, {"c": 2}])
+
+    def test_empty_array(self):
+        self.assertEqual(self.parse(['{"tasks": [', ' ]}']), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
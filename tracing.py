@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import inspect
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Tracer:
+    """Opt-in timing spans, appended to ~/.compass/trace.jsonl.
+
+    Off unless enable() is called (compass --trace, or COMPASS_TRACE=1).
+    While off, span() costs one attribute check and instrument() leaves
+    objects untouched. Each span is one JSON line: name, session, parent
+    span, start time, duration_ms, plus whatever attributes the caller
+    set (token counts, ttfb_ms, ...). When the file grows past max_bytes
+    it is rotated to trace.jsonl.1, so the two files hold the most recent
+    spans.
+    """
+
+    def __init__(self, path=None, max_bytes: int = 5 * 1024 * 1024):
+        self.path = Path(path) if path else Path.home() / ".compass" / "trace.jsonl"
+        self.max_bytes = max_bytes
+        self.enabled = False
+        self.session = uuid.uuid4().hex[:12]
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._current = contextvars.ContextVar("span", default=None)
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            atexit.register(self.flush)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time the block as one span. Yields a dict the block may add attributes to."""
+        if not self.enabled:
+            yield attrs
+            return
+        parent = self._current.get()
+        token = self._current.set(name)
+        started = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            duration = (time.perf_counter() - t0) * 1000
+            try:
+                self._current.reset(token)
+            except ValueError:
+                pass  # a generator finalized from another context
+            self._record({"name": name, "session": self.session, "parent": parent,
+                          "start": round(started, 3), "duration_ms": round(duration, 3),
+                          **attrs})
+
+    def _record(self, span: Dict):
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) >= 500:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        self.path.parent.mkdir(exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size > self.max_bytes:
+            os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(span, default=str) + "\n" for span in self._buffer))
+        self._buffer = []
+
+    def instrument(self, obj, prefix: str):
+        """Wrap obj's public methods in spans named prefix.method; returns obj.
+
+        A no-op while tracing is off. Generator methods are timed across
+        the whole iteration, not just the call.
+        """
+        if not self.enabled:
+            return obj
+        for name in dir(type(obj)):
+            attr = getattr(type(obj), name, None)
+            if name.startswith("_") or isinstance(attr, property) or not callable(attr):
+                continue
+            if inspect.iscoroutinefunction(attr):
+                continue  # async spans come from the transport
+            setattr(obj, name, self._wrap(getattr(obj, name), f"{prefix}.{name}"))
+        return obj
+
+    def _wrap(self, method, name: str):
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def traced_generator(*args, **kwargs):
+                with self.span(name):
+                    yield from method(*args, **kwargs)
+            return traced_generator
+
+        @functools.wraps(method)
+        def traced(*args, **kwargs):
+            with self.span(name):
+                return method(*args, **kwargs)
+        return traced
+
+    def load(self, sessions: int = None) -> List[Dict]:
+        """Recorded spans, oldest first, limited to the last sessions sessions."""
+        self.flush()
+        spans = []
+        for path in (self.path.with_name(self.path.name + ".1"), self.path):
+            if path.exists():
+                with open(path) as f:
+                    for line in f:
+                        try:
+                            spans.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            pass  # a line cut short by a crash
+        if sessions:
+            recent = set(list(dict.fromkeys(span["session"] for span in spans))[-sessions:])
+            spans = [span for span in spans if span["session"] in recent]
+        return spans
+
+    def report(self, spans: List[Dict]) -> List[Dict]:
+        """Per-operation count and p50/p95/p99/max duration, slowest p95 first.
+
+        Operations with ttfb_ms or token counts also get p50 time to first
+        byte and mean input/output tokens.
+        """
+        by_name = {}
+        for span in spans:
+            by_name.setdefault(span["name"], []).append(span)
+
+        rows = []
+        for name, group in by_name.items():
+            durations = [span["duration_ms"] for span in group]
+            row = {"name": name, "count": len(group),
+                   "p50": percentile(durations, 50), "p95": percentile(durations, 95),
+                   "p99": percentile(durations, 99), "max": max(durations)}
+            ttfbs = [span["ttfb_ms"] for span in group if span.get("ttfb_ms") is not None]
+            if ttfbs:
+                row["ttfb_p50"] = percentile(ttfbs, 50)
+            for key in ("input_tokens", "output_tokens"):
+                counts = [span[key] for span in group if span.get(key) is not None]
+                if counts:
+                    row[key] = sum(counts) / len(counts)
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["p95"], reverse=True)
+
+
+# The process-wide tracer
+tracer = Tracer()
+span = tracer.span
+if os.getenv("COMPASS_TRACE"):
+    tracer.enable()
@@ -1,14 +1,24 @@
 import os
+import copy
 import json
+import tempfile
 from pathlib import Path
 from typing import Dict, Optional
 
 class UserProfile:
-    """Manages user-global context stored in ~/.compass/user_profile.json"""
+    """Manages user-global context stored in ~/.compass/user_profile.json
+
+    The parsed profile is cached in memory and only re-read when the file's
+    mtime or size changes (e.g. another compass process saved it). Writes go
+    to a temp file that is renamed over the profile, so readers never see a
+    half-written file.
+    """
 
     def __init__(self):
         self.compass_dir = Path.home() / ".compass"
         self.profile_path = self.compass_dir / "user_profile.json"
+        self._cache = None
+        self._cache_stat = None  # (mtime_ns, size) the cache was read at
         self._ensure_directory()
 
     def _ensure_directory(self):
@@ -19,18 +29,41 @@ class UserProfile:
         """Check if user profile exists"""
         return self.profile_path.exists()
 
+    def _stat_key(self) -> Optional[tuple]:
+        try:
+            st = self.profile_path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
     def load(self) -> Dict:
         """Load user profile, return empty dict if doesn't exist"""
-        if not self.exists():
+        stat_key = self._stat_key()
+        if stat_key is None:
+            self._cache = self._cache_stat = None
             return {}
 
-        with open(self.profile_path, 'r') as f:
-            return json.load(f)
+        if stat_key != self._cache_stat:
+            with open(self.profile_path, 'r') as f:
+                self._cache = json.load(f)
+            self._cache_stat = stat_key
+
+        return copy.deepcopy(self._cache)
 
     def save(self, profile_data: Dict):
-        """Save user profile"""
-        with open(self.profile_path, 'w') as f:
-            json.dump(profile_data, f, indent=2)
+        """Save user profile via temp file + rename so it is never torn"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.compass_dir, prefix=".user_profile.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(profile_data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.profile_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._cache = copy.deepcopy(profile_data)
+        self._cache_stat = self._stat_key()
 
     def update(self, updates: Dict):
         """Update specific fields in profile"""